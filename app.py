@@ -4,7 +4,6 @@ from mainpages.map_page import render_map_page
 from mainpages.charge_fee import render_charge_fee_page
 from mainpages.infra_page import render_infra_page
 from mainpages.faq_page import render_faq_page
-from mainpages.congestion_page import load_and_preprocess
 from mainpages.congestion_page import render_congestion_page
 from mainpages.subsidy_page import render_subsidy_page
 from utils.db import get_db
@@ -12,7 +11,7 @@ from utils.db import get_db
 
 class App:
     def __init__(self):
-        # DB 연결
+        # DB 연결 풀 (모든 세션이 공유)
         self.conn = get_db()
 
         # 초기 세션 상태 설정
@@ -39,5 +38,4 @@ class App:
         elif page == "전기차 보조금 정보":
             render_subsidy_page(self.conn)
         elif page == "충전소 혼잡도":
-            load_and_preprocess(self.conn)
             render_congestion_page(self.conn)
@@ -1,61 +1,252 @@
-import re
+import io
+import logging
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
+import pyarrow as pa
+from utils.csv_cache import SAMPLE_BYTES, sniff_encoding
+from utils.db import table_version
+from utils.fee_history import CUSTOMER_TYPES, FeeHistory
+from utils.parquet_cache import cached_read_sql
 
+logger = logging.getLogger(__name__)
 
-def format_phone(x) -> str:
-    if x is None:
-        return ""
-    digits = re.sub(r"\D", "", str(x))
-    if digits == "" or digits == "00000000":
-        return ""
-    if len(digits) == 8:
-        return f"{digits[:4]}-{digits[4:]}"
-    if digits.startswith("02") and len(digits) >= 9:
-        return f"{digits[:2]}-{digits[2:-4]}-{digits[-4:]}"
-    if len(digits) >= 10:
-        return f"{digits[:3]}-{digits[3:-4]}-{digits[-4:]}"
-    return digits
+
+def format_phones(phones: pd.Series) -> pd.Series:
+    """전화번호 열 전체를 한 번에 '02-123-4567' / '1588-1234' / '010-1234-5678' 형식으로 바꿉니다."""
+    digits = phones.fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    n = digits.str.len()
+    dash = "-"
+    # 앞자리 길이만 다르고 뒤 네 자리는 항상 같은 위치
+    tail = dash + digits.str.slice(-4)
+    return pd.Series(np.select(
+        [
+            (digits == "") | (digits == "00000000"),
+            n == 8,
+            digits.str.startswith("02") & (n >= 9),
+            n >= 10,
+        ],
+        [
+            "",
+            digits.str.slice(0, 4) + dash + digits.str.slice(4),
+            digits.str.slice(0, 2) + dash + digits.str.slice(2, -4) + tail,
+            digits.str.slice(0, 3) + dash + digits.str.slice(3, -4) + tail,
+        ],
+        default=digits,
+    ), index=phones.index)
 
 
 @st.cache_data(show_spinner=False)
-def load(_conn) -> pd.DataFrame:
+def load(version, _conn) -> pd.DataFrame:
     sql = """
         SELECT companyName, coPhoneNo, customerType, averageFee
         FROM charge_fee
     """
-    df = pd.read_sql(sql, _conn)
+    df = cached_read_sql(sql, _conn, "charge_fee")
     df = df.rename(columns={
         "companyName": "업체명",
         "coPhoneNo": "업체 전화번호",
         "customerType" : "회원가 여부",
         "averageFee": "평균 충전요금(원 / kWh)",
     })
-    df["업체 전화번호"] = df["업체 전화번호"].apply(format_phone)
-    df['회원가 여부'] = df['회원가 여부'].replace({
+    df["업체 전화번호"] = format_phones(df["업체 전화번호"])
+    df['회원가 여부'] = df['회원가 여부'].map({
         'M': '회원가',
         'G': '비회원가'
-    })
+    }).fillna(df['회원가 여부'])
     df["평균 충전요금(원 / kWh)"] = pd.to_numeric(df["평균 충전요금(원 / kWh)"], errors="coerce")
 
-    pivot_df = df.pivot_table(
-        index=["업체명", "업체 전화번호"],
-        columns="회원가 여부",
-        values="평균 충전요금(원 / kWh)"
-    ).reset_index()
+    # pivot_table과 같은 결과(중복은 평균)를 groupby 한 번으로 계산
+    pivot_df = (
+        df.groupby(["업체명", "업체 전화번호", "회원가 여부"], sort=True)["평균 충전요금(원 / kWh)"]
+          .mean()
+          .unstack("회원가 여부")
+          .dropna(how="all")
+          .reset_index()
+    )
 
     pivot_df.columns.name = None
 
     return pivot_df
 
 
+# 정렬 옵션 → (정렬 열, 오름차순 여부)
+SORT_OPTIONS = {
+    "비회원가 높은 순": ("비회원가", False),
+    "비회원가 낮은 순": ("비회원가", True),
+    "회원가 높은 순": ("회원가", False),
+    "회원가 낮은 순": ("회원가", True),
+    "업체명 가나다 순": ("업체명", True),
+}
+
+
+class FeeTable:
+    """업체별 요금표와 정렬 옵션별 행 순서(인덱스 순열)
+
+    정렬은 데이터 버전마다 한 번만 하고, 화면에서는 순열로 행을 골라 보여줍니다.
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.names = self.df["업체명"].astype(str).str.lower()
+        self.orders = {
+            option: self._order(col, ascending)
+            for option, (col, ascending) in SORT_OPTIONS.items()
+            if col in self.df.columns
+        }
+        self.calculator = FeeCalculator(self.df)
+
+    def _order(self, col, ascending):
+        return self.df[col].sort_values(ascending=ascending, na_position='last', kind='stable').index.to_numpy()
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def cheapest(self, col, n=10):
+        """col 요금이 0보다 큰 업체 중 가장 저렴한 n곳"""
+        order = self.orders[f"{col} 낮은 순"]
+        fee = self.df[col].to_numpy()[order]
+        return self.df.take(order[fee > 0][:n])
+
+    def view(self, sort_option, keyword=""):
+        """sort_option 순서로 정렬하고, 업체명에 keyword가 들어간 행만 남긴 표"""
+        order = self.orders.get(sort_option, self.orders["업체명 가나다 순"])
+        keyword = keyword.strip().lower()
+        if keyword:
+            mask = self.names.str.contains(keyword, regex=False).to_numpy()
+            order = order[mask[order]]
+        return self.df.take(order)
+
+
+class FeeCalculator:
+    """월 충전량과 회원 여부로 업체별 월 예상 충전비를 계산하는 계산기
+
+    월 충전비 = 충전량 × 요금이라 순위는 충전량과 상관없이 요금 순서와 같습니다.
+    회원/비회원별 요금을 오름차순으로 정렬해 두고 앞에서부터 k개를 잘라 쓰므로,
+    상위 k곳 조회는 정렬 없이 O(k), 업체 m곳을 지정한 조회는 O(m log m)입니다.
+    회원 요금이 없는 업체는 회원이어도 비회원가를 적용합니다.
+    """
+
+    def __init__(self, df):
+        names = df["업체명"].astype(str).to_numpy(dtype=object)
+        non_member = self._fee_column(df, "비회원가")
+        member = self._fee_column(df, "회원가")
+        member = np.where(np.isnan(member) | (member <= 0), non_member, member)
+
+        # is_member(bool) → (정렬된 요금, 같은 순서의 업체명, 업체명 → 위치 인덱스)
+        self.sorted_fees, self.sorted_names, self._positions = {}, {}, {}
+        for is_member, fee in ((True, member), (False, non_member)):
+            valid = ~np.isnan(fee) & (fee > 0)
+            order = np.argsort(fee[valid], kind="stable")
+            sorted_fee, sorted_name = fee[valid][order], names[valid][order]
+            # 같은 업체명이 여러 행이면 가장 저렴한 요금만 사용
+            first = ~pd.Index(sorted_name).duplicated()
+            self.sorted_fees[is_member] = sorted_fee[first]
+            self.sorted_names[is_member] = sorted_name[first]
+            self._positions[is_member] = pd.Index(sorted_name[first])
+
+    @staticmethod
+    def _fee_column(df, col):
+        if col not in df:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.sorted_names[False])
+
+    def _select(self, member, operators=None, k=None):
+        """조건에 맞는 업체의 정렬 위치 배열 (저렴한 순)"""
+        if operators is None:
+            n = len(self.sorted_fees[member])
+            return np.arange(n if k is None else min(k, n))
+        pos = self._positions[member].get_indexer(list(operators))
+        pos = np.sort(pos[pos >= 0])
+        return pos if k is None else pos[:k]
+
+    def rank(self, monthly_kwh, member=False, operators=None, k=None):
+        """업체별 월 예상 충전비를 저렴한 순으로 반환합니다. operators를 주면 그 업체만 비교합니다."""
+        pos = self._select(bool(member), operators, k)
+        fee = self.sorted_fees[bool(member)][pos]
+        return pd.DataFrame({
+            "순위": np.arange(1, len(pos) + 1),
+            "업체명": self.sorted_names[bool(member)][pos],
+            "적용 요금(원 / kWh)": fee,
+            "월 예상 충전비(원)": np.round(fee * monthly_kwh),
+        })
+
+    def cheapest(self, monthly_kwh, member=False, operators=None):
+        """가장 저렴한 (업체명, 요금, 월 예상 충전비). 비교할 업체가 없으면 None"""
+        pos = self._select(bool(member), operators, 1)
+        if len(pos) == 0:
+            return None
+        fee = float(self.sorted_fees[bool(member)][pos[0]])
+        return self.sorted_names[bool(member)][pos[0]], fee, round(fee * monthly_kwh)
+
+    def batch(self, monthly_kwh, member, k=1):
+        """여러 사용 패턴을 한 번에 계산합니다.
+
+        monthly_kwh, member는 같은 길이의 배열이며, 패턴마다 가장 저렴한 k곳의
+        업체명/월 예상 충전비 열을 가진 DataFrame을 반환합니다. (1순위 업체명, 1순위 충전비, ...)
+        """
+        kwh = np.asarray(monthly_kwh, dtype=float)
+        member = np.asarray(member, dtype=bool)
+        result = {}
+        for rank in range(k):
+            name = np.full(len(kwh), None, dtype=object)
+            cost = np.full(len(kwh), np.nan)
+            for is_member in (True, False):
+                rows = member == is_member
+                if rank < len(self.sorted_fees[is_member]):
+                    name[rows] = self.sorted_names[is_member][rank]
+                    cost[rows] = np.round(kwh[rows] * self.sorted_fees[is_member][rank])
+            result[f"{rank + 1}순위 업체명"] = name
+            result[f"{rank + 1}순위 충전비(원)"] = cost
+        return pd.DataFrame(result)
+
+
+@st.cache_resource(show_spinner=False)
+def get_fee_history():
+    """모든 세션이 공유하는 요금 이력 저장소"""
+    return FeeHistory()
+
+
+def record_fee_history(df, version):
+    """업체별 요금표를 오늘 날짜로 요금 이력에 기록합니다. (원본 데이터 버전이 바뀌었을 때만)"""
+    fees = df.melt(
+        id_vars=["업체명"], value_vars=[c for c in CUSTOMER_TYPES if c in df.columns],
+        var_name="customer_type", value_name="fee",
+    ).dropna(subset=["fee"]).rename(columns={"업체명": "company"})
+    try:
+        get_fee_history().record(fees, pd.Timestamp.today(), version)
+    except (OSError, ValueError, pa.ArrowException) as e:
+        # 이력 기록은 부가 기능이므로 실패해도 요금표는 그대로 보여줌 (손상된 이력 파일 포함)
+        logger.warning("요금 이력 기록 실패: %s", e)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_fee_table(version, _conn):
+    df = load(version, _conn)
+    if not df.empty:
+        record_fee_history(df, version)
+    return FeeTable(df)
+
+
+def get_fee_table(conn):
+    """
+    요금표를 반환
+    charge_fee 데이터 버전이 바뀔 때만 다시 만들고, 그 외에는 모든 세션이 같은 결과를 공유
+    """
+    return _build_fee_table(table_version(conn, "charge_fee"), conn)
+
+
 def render_charge_fee_page(conn):
     st.title("⚡ 충전소 업체별 요금")
     st.caption("차지인포 - 통계정보 - 충전 사업자별 충전요금 (2026년 1월 15일 기준)")
 
-    df = load(conn).copy()
-    if df.empty:
+    fees = get_fee_table(conn)
+    if fees.empty:
         st.warning("데이터가 없습니다.")
         return
 
@@ -75,15 +266,8 @@ def render_charge_fee_page(conn):
 
     sort_col = non_member_fee_col if chart_fee_type == "비회원가" else member_fee_col
 
-    # Sort by the selected fee type for the chart, showing the cheapest
-    # Filter out missing or zero values before sorting
-    bottom10 = (
-        df.copy()
-          .dropna(subset=[sort_col])
-          [lambda x: x[sort_col] > 0]
-          .sort_values(by=sort_col, ascending=True)
-          .head(10)
-    )
+    # Cheapest 10 from the cached ascending order (missing or zero values excluded)
+    bottom10 = fees.cheapest(sort_col, 10)
 
     chart = (
         alt.Chart(bottom10)
@@ -105,8 +289,6 @@ def render_charge_fee_page(conn):
     # =======================
     st.subheader("📋 업체별 평균 충전요금 목록")
 
-    filtered = df.copy()
-
     # --- 1. Define UI elements and get user input ---
     c1, c2 = st.columns([2, 1])
     with c1:
@@ -114,24 +296,11 @@ def render_charge_fee_page(conn):
     with c2:
         sort_option = st.selectbox(
             "정렬 기준",
-            ["비회원가 높은 순", "비회원가 낮은 순", "회원가 높은 순", "회원가 낮은 순", "업체명 가나다 순"]
+            list(SORT_OPTIONS)
         )
 
-    # --- 2. Apply filtering based on user input ---
-    if keyword.strip():
-        filtered = filtered[filtered["업체명"].astype(str).str.contains(keyword.strip(), case=False, na=False)]
-
-    # --- 3. Apply sorting based on user input ---
-    if sort_option == "비회원가 높은 순":
-        filtered = filtered.sort_values(by=non_member_fee_col, ascending=False, na_position='last')
-    elif sort_option == "비회원가 낮은 순":
-        filtered = filtered.sort_values(by=non_member_fee_col, ascending=True, na_position='last')
-    elif sort_option == "회원가 높은 순":
-        filtered = filtered.sort_values(by=member_fee_col, ascending=False, na_position='last')
-    elif sort_option == "회원가 낮은 순":
-        filtered = filtered.sort_values(by=member_fee_col, ascending=True, na_position='last')
-    else:
-        filtered = filtered.sort_values(by="업체명")
+    # --- 2. Apply filtering and sorting (cached row order) based on user input ---
+    filtered = fees.view(sort_option, keyword)
 
     st.dataframe(
         filtered,
@@ -140,4 +309,140 @@ def render_charge_fee_page(conn):
             member_fee_col: st.column_config.NumberColumn(format="%.1f원 / kWh"),
             non_member_fee_col: st.column_config.NumberColumn(format="%.1f원 / kWh"),
         }
-    )
\ No newline at end of file
+    )
+
+    st.divider()
+    render_cost_calculator(fees)
+
+    st.divider()
+    try:
+        history = get_fee_history()
+    except (OSError, ValueError, pa.ArrowException) as e:
+        st.warning(f"요금 변동 이력을 불러올 수 없습니다: {e}")
+        return
+    render_fee_history(history)
+
+
+# 일괄 계산 CSV 열 이름
+BATCH_KWH_COL = "월 충전량(kWh)"
+BATCH_MEMBER_COL = "회원 여부"
+
+
+def render_cost_calculator(fees):
+    st.subheader("🧮 월 충전비 계산기")
+    calc = fees.calculator
+
+    c1, c2, c3 = st.columns([1, 1, 1])
+    with c1:
+        monthly_kwh = st.number_input("월 충전량 (kWh)", min_value=0.0, value=300.0, step=10.0)
+    with c2:
+        member = st.radio("회원 여부", ["회원", "비회원"], horizontal=True) == "회원"
+    # 업체가 한 곳 이하면 slider의 최솟값과 최댓값이 같아지므로 표시하지 않음
+    top_k = max(len(calc), 1)
+    if len(calc) > 1:
+        with c3:
+            top_k = st.slider("표시할 업체 수", min_value=1, max_value=len(calc), value=min(10, len(calc)))
+    operators = st.multiselect("비교할 업체 (비우면 전체)", sorted(calc.sorted_names[False]))
+
+    best = calc.cheapest(monthly_kwh, member, operators or None)
+    if best is None:
+        st.info("비교할 수 있는 요금 정보가 없습니다.")
+        return
+    name, fee, cost = best
+    st.metric("가장 저렴한 업체", name, f"월 {cost:,.0f}원 ({fee:,.1f}원 / kWh)", delta_color="off")
+    st.dataframe(
+        calc.rank(monthly_kwh, member, operators or None, top_k),
+        hide_index=True,
+        column_config={
+            "적용 요금(원 / kWh)": st.column_config.NumberColumn(format="%.1f원 / kWh"),
+            "월 예상 충전비(원)": st.column_config.NumberColumn(format="%d원"),
+        },
+    )
+
+    with st.expander("여러 차량 한 번에 계산 (CSV 업로드)"):
+        st.caption(f"'{BATCH_KWH_COL}', '{BATCH_MEMBER_COL}'(회원/비회원) 열이 있는 CSV를 올리면 차량별로 가장 저렴한 업체를 계산합니다.")
+        uploaded = st.file_uploader("사용 패턴 CSV", type="csv")
+        if uploaded is None:
+            return
+        # 엑셀에서 저장한 CSV는 cp949인 경우가 많으므로 인코딩을 판별해서 읽음
+        data = uploaded.getvalue()
+        try:
+            profiles = pd.read_csv(io.BytesIO(data), encoding=sniff_encoding(data[:SAMPLE_BYTES]))
+        except (UnicodeDecodeError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            st.error(f"CSV 파일을 읽을 수 없습니다: {e}")
+            return
+        if BATCH_KWH_COL not in profiles:
+            st.error(f"'{BATCH_KWH_COL}' 열이 없습니다.")
+            return
+        kwh = pd.to_numeric(profiles[BATCH_KWH_COL], errors="coerce").fillna(0)
+        is_member = profiles[BATCH_MEMBER_COL].astype(str).str.strip().eq("회원") if BATCH_MEMBER_COL in profiles \
+            else np.zeros(len(profiles), dtype=bool)
+        result = pd.concat([profiles, calc.batch(kwh, is_member, k=3)], axis=1)
+        st.dataframe(result, hide_index=True)
+        st.download_button(
+            "결과 CSV 다운로드",
+            result.to_csv(index=False).encode("utf-8-sig"),
+            file_name="charge_cost_batch.csv",
+            mime="text/csv",
+        )
+
+
+def render_fee_history(history):
+    st.subheader("📈 요금 변동 이력")
+    if len(history.dates) < 2:
+        st.info(f"요금 데이터가 갱신될 때마다 이력이 쌓입니다. (현재 기록 {len(history.dates)}회)")
+        return
+
+    dates = [d.date() for d in history.dates]
+    tab1, tab2 = st.tabs(["업체별 요금 추이", "요금 변동 큰 업체"])
+
+    with tab1:
+        current = set(history.state_at()['company'])
+        company = st.selectbox(
+            "업체 선택", history.companies,
+            format_func=lambda c: c if c in current else f"{c} (현재 없음)",
+        )
+        series = history.series(company).reset_index().melt(
+            id_vars="date", var_name="구분", value_name="요금"
+        ).dropna(subset=["요금"])
+        chart = (
+            alt.Chart(series)
+            .mark_line(point=True)
+            .encode(
+                x=alt.X("date:T", title="기록일"),
+                y=alt.Y("요금:Q", title="평균가(원 / kWh)", scale=alt.Scale(zero=False)),
+                color=alt.Color("구분:N", title=None),
+                tooltip=[alt.Tooltip("date:T", title="기록일"), "구분", alt.Tooltip("요금:Q", format=",.1f")],
+            )
+            .properties(height=300)
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+    with tab2:
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            start = st.selectbox("시작일", dates, index=0)
+        with c2:
+            end = st.selectbox("종료일", dates, index=len(dates) - 1)
+        with c3:
+            fee_type = st.radio("요금 종류", CUSTOMER_TYPES[::-1], horizontal=True, key="history_fee_type")
+        movers = history.movers(start, end, fee_type, n=10).rename(columns={
+            "company": "업체명",
+            "fee_start": "시작일 요금",
+            "fee_end": "종료일 요금",
+            "change": "변동(원)",
+            "change_pct": "변동률(%)",
+        })
+        if movers.empty:
+            st.info("선택한 기간에 요금이 바뀐 업체가 없습니다.")
+        else:
+            st.dataframe(
+                movers,
+                hide_index=True,
+                column_config={
+                    "시작일 요금": st.column_config.NumberColumn(format="%.1f원"),
+                    "종료일 요금": st.column_config.NumberColumn(format="%.1f원"),
+                    "변동(원)": st.column_config.NumberColumn(format="%+.1f원"),
+                    "변동률(%)": st.column_config.NumberColumn(format="%+.1f%%"),
+                },
+            )
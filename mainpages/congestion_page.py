@@ -1,6 +1,13 @@
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
-from datetime import datetime
+import altair as alt
+from datetime import datetime, timedelta
+from utils.db import table_version
+from utils.parquet_cache import cached_read_sql
+from utils.congestion_profile import read_profile, read_weekly_profile
+from utils.charge_log import CHARGE_LOG_PATH, ChargeLogIngestor, CsvLogSource
 
 # =========================
 # 혼잡도 메타데이터 (UI용)
@@ -27,86 +34,252 @@ CONGESTION_META = {
 }
 
 # =========================
-# 데이터 로드 + 전처리 (MySQLdb self.conn 사용)
+# 요일·시간대별 집계 로드 (DB 집계 테이블 사용)
 # =========================
-def load_and_preprocess(conn):
+def load_profile(conn):
     """
-    app.py에서 전달받은 self.conn (MySQLdb connection) 사용
+    DB에 유지되는 (충전방식, 요일, 시간대) 집계 테이블을 읽음
+    원본 행 대신 충전방식 수 × 7 × 24행만 전송됨
     """
-    sql = """
-        SELECT
-            date,
-            charge_type,
-            hour,
-            kwh
-        FROM ev_charge_load
+    return read_profile(conn).rename(columns={
+        "charge_type": "충전방식"
+    })
+
+
+# =========================
+# 혼잡도 큐브 생성 (충전방식 × 요일 × 시간대)
+# =========================
+WEEKDAY_LABELS = ["월", "화", "수", "목", "금", "토", "일"]
+LEVEL_LABELS = np.array(["여유", "보통", "혼잡"])
+
+
+class CongestionCube:
+    """
+    충전방식 × 요일 × 시간대 평균 충전량과 혼잡도 단계를 담은 배열 묶음
+    - kwh:   (충전방식, 7, 24) 평균 충전량, 데이터가 없으면 NaN
+    - level: (충전방식, 7, 24) 0=여유, 1=보통, 2=혼잡, -1=데이터 없음
+    - hourly_kwh: (충전방식, 24) 요일을 합친 시간대별 평균 충전량
     """
 
-    ev_load = pd.read_sql(sql, conn)
+    def __init__(self, charge_types, kwh, level, hourly_kwh, q25, q75):
+        self.charge_types = list(charge_types)
+        self.kwh = kwh
+        self.level = level
+        self.hourly_kwh = hourly_kwh
+        # 충전방식별 혼잡도 분류 기준 (25%/75% 분위수)
+        self.q25 = q25
+        self.q75 = q75
+        self._index = {charge_type: i for i, charge_type in enumerate(self.charge_types)}
 
-    ev_load = ev_load.rename(columns={
-        "date": "일자",
-        "charge_type": "충전방식",
-        "kwh": "kWh"
-    })
+    def classify(self, charge_type, kwh):
+        """같은 기준으로 임의의 충전량 배열을 혼잡도 단계로 분류"""
+        i = self._index[charge_type]
+        kwh = np.asarray(kwh, dtype=float)
+        return LEVEL_LABELS[np.select([kwh >= self.q75[i], kwh <= self.q25[i]], [2, 0], default=1)]
 
-    ev_load["일자"] = pd.to_datetime(ev_load["일자"])
-    return ev_load
+    def level_at(self, charge_type, weekday, hour):
+        i = self._index.get(charge_type)
+        if i is None:
+            return None
+        code = self.level[i, weekday, hour]
+        return LEVEL_LABELS[code] if code >= 0 else None
+
+    def hourly_frame(self, charge_type):
+        i = self._index[charge_type]
+        return pd.DataFrame({"kWh": self.hourly_kwh[i]}, index=pd.RangeIndex(24, name="hour"))
+
+    def weekday_frame(self, charge_type):
+        """요일 × 시간대 평균 충전량과 혼잡도 (히트맵용 long format)"""
+        i = self._index[charge_type]
+        weekday, hour = np.meshgrid(np.arange(7), np.arange(24), indexing="ij")
+        codes = self.level[i].ravel()
+        return pd.DataFrame({
+            "요일": np.array(WEEKDAY_LABELS)[weekday.ravel()],
+            "hour": hour.ravel(),
+            "kWh": self.kwh[i].ravel(),
+            "혼잡도": np.where(codes >= 0, LEVEL_LABELS[codes.clip(0)], None),
+        })
+
+
+def build_congestion_cube(profile):
+    """
+    (충전방식, 요일, 시간대) 합계/건수로 평균과 혼잡도 단계를 한 번에 계산
+    충전방식마다 요일·시간대 전체 평균의 25%/75% 분위수를 기준으로
+    75% 이상은 혼잡, 25% 이하는 여유, 그 사이는 보통으로 분류
+    """
+    charge_types, type_idx = np.unique(profile["충전방식"].to_numpy(), return_inverse=True)
+    weekday = profile["weekday"].to_numpy(dtype=np.intp)
+    hour = profile["hour"].to_numpy(dtype=np.intp)
+
+    shape = (len(charge_types), 7, 24)
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    np.add.at(sums, (type_idx, weekday, hour), profile["kwh_sum"].to_numpy(dtype=float))
+    np.add.at(counts, (type_idx, weekday, hour), profile["kwh_count"].to_numpy(dtype=float))
+
+    kwh = np.divide(sums, counts, out=np.full(shape, np.nan), where=counts > 0)
+
+    flat = kwh.reshape(len(charge_types), -1)
+    q25, q75 = np.nanquantile(flat, [0.25, 0.75], axis=1)
+    level = np.select(
+        [kwh >= q75[:, None, None], kwh <= q25[:, None, None]],
+        [2, 0],
+        default=1,
+    ).astype(np.int8)
+    level[np.isnan(kwh)] = -1
+
+    hourly_sums = sums.sum(axis=1)
+    hourly_counts = counts.sum(axis=1)
+    hourly_kwh = np.divide(
+        hourly_sums, hourly_counts,
+        out=np.full(hourly_sums.shape, np.nan), where=hourly_counts > 0
+    )
+
+    return CongestionCube(charge_types, kwh, level, hourly_kwh, q25, q75)
 
 
 # =========================
-# 혼잡도 기준 테이블 생성
+# 데이터 버전별 혼잡도 큐브 캐시
 # =========================
-def build_congestion_table(ev_load_long):
-    hourly_mean = (
-        ev_load_long
-        .groupby(["충전방식", "hour"])["kWh"]
-        .mean()
-        .reset_index()
-    )
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_congestion_cube(version, _conn):
+    profile = load_profile(_conn)
+    if profile.empty:
+        return None
+    return build_congestion_cube(profile)
 
-    def assign_level(df):
-        q25 = df["kWh"].quantile(0.25)
-        q75 = df["kWh"].quantile(0.75)
-
-        def classify(x):
-            if x >= q75:
-                return "혼잡"
-            elif x <= q25:
-                return "여유"
-            else:
-                return "보통"
-
-        df = df.copy()
-        df["congestion"] = df["kWh"].apply(classify)
-        return df
-
-    return (
-        hourly_mean
-        .groupby("충전방식", group_keys=False)
-        .apply(assign_level)
-    )
+
+def get_congestion_cube(conn):
+    """
+    혼잡도 큐브를 반환
+    ev_charge_load 데이터 버전이 바뀔 때만 다시 계산하고, 그 외에는 모든 세션이 같은 결과를 공유
+    """
+    return _build_congestion_cube(table_version(conn, "ev_charge_load"), conn)
 
 
 # =========================
-# 현재 시간 혼잡도 조회
+# 단기 혼잡도 예측 (요일·시간대 계절 프로파일 + 지수 평활)
+# =========================
+# 지수 평활 계수: 1주 전 관측값의 가중치가 (1 - FORECAST_ALPHA)배로 줄어듦
+FORECAST_ALPHA = 0.3
+# 신뢰 구간 배수 (정규분포 80% 구간)
+FORECAST_Z = 1.2816
+# 학습에 쓰는 최근 주 수 (26주 전 관측값의 가중치는 0.7 ** 26 ≈ 0.0001로 무시할 만함)
+FORECAST_WEEKS = 26
+FORECAST_COLUMNS = ["시각", "예상 kWh", "하한", "상한", "혼잡도"]
+
+
+class CongestionForecast:
+    """
+    충전방식 × 요일 × 시간대별 지수 평활 평균/표준편차
+    요일·시간대 칸마다 주 단위로 관측값이 쌓이므로, 최근 주일수록 큰 가중치를 줘서 평균을 냄
+    """
+
+    def __init__(self, charge_types, mean, std):
+        self.charge_types = list(charge_types)
+        self.mean = mean
+        self.std = std
+        self._index = {charge_type: i for i, charge_type in enumerate(self.charge_types)}
+
+    def index_of(self, charge_type):
+        """충전방식의 배열 위치 (학습 데이터에 없으면 None)"""
+        return self._index.get(charge_type)
+
+    def has_type(self, charge_type):
+        return charge_type in self._index
+
+
+def fit_forecast(weekly, alpha=FORECAST_ALPHA):
+    """
+    (충전방식, 요일, 시간대, 지난 주 수)별 합계/제곱합/건수로 예측 파라미터를 계산
+    가중치 w = (1 - alpha) ** (마지막 날짜로부터 지난 주 수) 로 칸별 가중 평균/분산을 구함
+    """
+    charge_types, type_idx = np.unique(weekly["charge_type"].to_numpy(), return_inverse=True)
+    weekday = weekly["weekday"].to_numpy(dtype=np.intp)
+    hour = weekly["hour"].to_numpy(dtype=np.intp)
+    weight = (1 - alpha) ** weekly["age_weeks"].to_numpy(dtype=float)
+
+    shape = (len(charge_types), 7, 24)
+    cell = (type_idx, weekday, hour)
+    w_sum = np.zeros(shape)
+    wx_sum = np.zeros(shape)
+    wxx_sum = np.zeros(shape)
+    np.add.at(w_sum, cell, weight * weekly["kwh_count"].to_numpy(dtype=float))
+    np.add.at(wx_sum, cell, weight * weekly["kwh_sum"].to_numpy(dtype=float))
+    np.add.at(wxx_sum, cell, weight * weekly["kwh_sq_sum"].to_numpy(dtype=float))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = wx_sum / w_sum
+        var = np.clip(wxx_sum / w_sum - mean ** 2, 0, None)
+
+    return CongestionForecast(charge_types, mean, np.sqrt(var))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _fit_forecast(version, _conn):
+    # 원본 행 대신 최근 FORECAST_WEEKS주의 주별 집계만 읽음
+    weekly = read_weekly_profile(_conn, FORECAST_WEEKS)
+    if weekly.empty:
+        return None
+    return fit_forecast(weekly)
+
+
+def get_forecast_model(conn):
+    """데이터 버전당 한 번만 학습한 예측 파라미터를 반환"""
+    return _fit_forecast(table_version(conn, "ev_charge_load"), conn)
+
+
+def forecast_congestion(model, cube, charge_type, hours=12, now=None):
+    """
+    지금부터 hours시간 동안의 예상 충전량, 신뢰 구간, 혼잡도를 반환
+    학습된 배열에서 (요일, 시간) 칸을 바로 꺼내므로 다시 학습하지 않음
+    """
+    i = model.index_of(charge_type)
+    if i is None:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    now = now or datetime.now()
+    start = now.replace(minute=0, second=0, microsecond=0)
+    times = pd.date_range(start + timedelta(hours=1), periods=hours, freq="h")
+    weekday = times.weekday.to_numpy()
+    hour = times.hour.to_numpy()
+
+    mean = model.mean[i, weekday, hour]
+    std = model.std[i, weekday, hour]
+
+    return pd.DataFrame({
+        "시각": times,
+        "예상 kWh": mean,
+        "하한": np.clip(mean - FORECAST_Z * std, 0, None),
+        "상한": mean + FORECAST_Z * std,
+        "혼잡도": cube.classify(charge_type, mean),
+    })
+
+
 # =========================
-def get_current_congestion(congestion_table, charge_type):
-    current_hour = datetime.now().hour
+# 충전 세션 로그 스트리밍 집계
+# =========================
+@st.cache_resource(show_spinner=False)
+def get_charge_log_ingestor(path):
+    """모든 세션이 공유하는 로그 집계기 (프로세스당 하나)"""
+    return ChargeLogIngestor(CsvLogSource(path))
+
 
-    row = congestion_table[
-        (congestion_table["충전방식"] == charge_type) &
-        (congestion_table["hour"] == current_hour)
-    ]
+# =========================
+# 현재 시간 혼잡도 조회
+# =========================
+def get_current_congestion(cube, charge_type):
+    now = datetime.now()
+    level = cube.level_at(charge_type, now.weekday(), now.hour)
 
-    if row.empty:
+    if level is None:
         return None
 
-    level = row["congestion"].iloc[0]
     meta = CONGESTION_META[level]
 
     return {
-        "hour": current_hour,
+        "weekday": WEEKDAY_LABELS[now.weekday()],
+        "hour": now.hour,
         "charge_type": charge_type,
         "level": level,
         "label": meta["label"],
@@ -122,37 +295,137 @@ def get_current_congestion(congestion_table, charge_type):
 def render_congestion_page(conn):
     st.title("⚡ 시간대별 충전소 혼잡도")
 
-    # 데이터 로드
-    ev_load_long = load_and_preprocess(conn)
+    # 데이터 로드 (버전별 캐시)
+    cube = get_congestion_cube(conn)
 
-    if ev_load_long.empty:
+    if cube is None:
         st.warning("혼잡도 데이터가 없습니다.")
         return
 
-    congestion_table = build_congestion_table(ev_load_long)
-
     # 충전방식 선택
     charge_type = st.selectbox(
         "충전 방식 선택",
-        sorted(ev_load_long["충전방식"].unique())
+        cube.charge_types
     )
 
-    # 현재 혼잡도
-    current = get_current_congestion(congestion_table, charge_type)
+    # 현재 혼잡도 (현재 요일 + 시간 기준)
+    current = get_current_congestion(cube, charge_type)
 
     if current:
         st.metric(
-            label=f"{current['hour']}시 혼잡도",
+            label=f"{current['weekday']}요일 {current['hour']}시 혼잡도",
             value=f"{current['emoji']} {current['label']}",
             help=current["message"]
         )
 
     # 시간대별 차트
     st.subheader("시간대별 평균 충전량 (kWh)")
-    chart_df = (
-        congestion_table[congestion_table["충전방식"] == charge_type]
-        .sort_values("hour")
-        .set_index("hour")[["kWh"]]
-    )
+    chart_df = cube.hourly_frame(charge_type)
 
     st.line_chart(chart_df)
+
+    # 요일 × 시간대 히트맵
+    st.subheader("요일·시간대별 혼잡도")
+    heatmap = (
+        alt.Chart(cube.weekday_frame(charge_type))
+        .mark_rect()
+        .encode(
+            x=alt.X("hour:O", title="시간"),
+            y=alt.Y("요일:N", sort=WEEKDAY_LABELS, title=None),
+            color=alt.Color(
+                "혼잡도:N",
+                scale=alt.Scale(
+                    domain=list(CONGESTION_META),
+                    range=[meta["color"] for meta in CONGESTION_META.values()]
+                ),
+            ),
+            tooltip=["요일", "hour", "혼잡도", alt.Tooltip("kWh:Q", format=",.1f")],
+        )
+        .properties(height=260)
+    )
+    st.altair_chart(heatmap, use_container_width=True)
+
+    render_forecast_section(conn, cube, charge_type)
+
+    if CHARGE_LOG_PATH:
+        render_charge_log_section(charge_type)
+
+
+def render_forecast_section(conn, cube, charge_type):
+    st.subheader("향후 혼잡도 예측")
+
+    model = get_forecast_model(conn)
+    if model is None:
+        st.info("예측에 사용할 데이터가 없습니다.")
+        return
+    if not model.has_type(charge_type):
+        st.info("선택한 충전 방식의 예측 데이터가 없습니다.")
+        return
+
+    hours = st.slider("예측 시간 범위 (시간)", min_value=3, max_value=24, value=12, key="congestion_forecast_hours")
+    forecast = forecast_congestion(model, cube, charge_type, hours)
+    forecast = forecast.dropna(subset=["예상 kWh"])
+    if forecast.empty:
+        st.info("선택한 충전 방식의 예측 데이터가 없습니다.")
+        return
+
+    best = forecast.loc[forecast["예상 kWh"].idxmin()]
+    st.success(
+        f"가장 여유로울 것으로 예상되는 시간: {best['시각']:%m/%d %H}시 "
+        f"(예상 {best['예상 kWh']:,.1f} kWh, {best['혼잡도']})"
+    )
+
+    base = alt.Chart(forecast).encode(x=alt.X("시각:T", title=None, axis=alt.Axis(format="%d일 %H시")))
+    band = base.mark_area(opacity=0.25).encode(
+        y=alt.Y("하한:Q", title="예상 충전량 (kWh)"),
+        y2="상한:Q",
+    )
+    # 선은 하나로 잇고, 혼잡도 색은 점에만 칠함 (선에 색을 주면 단계별로 끊어진 선이 됨)
+    line = base.mark_line().encode(y="예상 kWh:Q")
+    points = base.mark_point(filled=True, size=60).encode(
+        y="예상 kWh:Q",
+        color=alt.Color(
+            "혼잡도:N",
+            scale=alt.Scale(
+                domain=list(CONGESTION_META),
+                range=[meta["color"] for meta in CONGESTION_META.values()]
+            ),
+        ),
+        tooltip=[
+            alt.Tooltip("시각:T", format="%m/%d %H시"),
+            alt.Tooltip("예상 kWh:Q", format=",.1f"),
+            alt.Tooltip("하한:Q", format=",.1f"),
+            alt.Tooltip("상한:Q", format=",.1f"),
+            "혼잡도",
+        ],
+    )
+    st.altair_chart((band + line + points).properties(height=300), use_container_width=True)
+    st.caption("최근 주의 같은 요일·시간대에 더 큰 가중치를 둔 평균이며, 음영은 80% 신뢰 구간입니다.")
+
+
+def render_charge_log_section(charge_type):
+    st.subheader("최근 충전 세션 로그")
+
+    if not os.path.exists(CHARGE_LOG_PATH):
+        st.info(f"충전 세션 로그 파일을 찾을 수 없습니다: {CHARGE_LOG_PATH}")
+        return
+
+    ingestor = get_charge_log_ingestor(CHARGE_LOG_PATH)
+    try:
+        # 지난번 이후 추가된 행만 읽어 반영
+        ingestor.poll()
+    except Exception as e:
+        st.error(f"충전 세션 로그를 읽는 중 오류가 발생했습니다: {e}")
+        return
+
+    histogram = ingestor.histogram
+    profile = histogram.hourly_profile(charge_type)
+    if profile.empty or histogram.total_sessions == 0:
+        st.info("선택한 충전 방식의 세션 기록이 없습니다.")
+        return
+
+    st.caption(
+        f"최근 {histogram.window_days}일 기준 시간대별 하루 평균 세션 수 "
+        f"(누적 반영 {ingestor.rows_ingested:,}건)"
+    )
+    st.bar_chart(profile[["세션 수"]])
@@ -1,39 +1,48 @@
 import streamlit as st
 import pandas as pd
 import re
+from functools import lru_cache
 from utils.db import get_db
+from utils.faq_search import get_faq_index, search_tokens
+from utils.pagination import paginate
 
 # --- 1. 유틸리티 및 데이터 로딩 함수 ---
-TRANSLATION_MAP = {
-    "충전": "charge", "배터리": "battery", "보증": "warranty",
-    "타이어": "tire", "유지보수": "maintenance", "소프트웨어": "software",
-    "결제": "payment", "속도": "speed", "예약": "reserve",
-    "성능": "performance", "안전": "safety", "서비스": "service"
-}
+# 검색 결과로 보여줄 최대 FAQ 수
+FAQ_TOP_K = 30
 
-def highlight_keyword(text, keyword, eng_keyword=None):
-    if not keyword:
+# 같은 질문/검색어 조합은 rerun마다 다시 치환하지 않음
+@lru_cache(maxsize=4096)
+def highlight_keyword(text, tokens):
+    """검색에 쓴 토큰(search_tokens)과 같은 부분만 강조합니다.
+
+    한글 토큰은 단어 안의 글자 조각 그대로, 영문/숫자 토큰은 단어 전체가 같을 때만 강조합니다.
+    """
+    if not tokens:
         return text
-    clean_keyword = re.escape(keyword)
-    text = re.sub(f"({clean_keyword})", r"**\1**", text, flags=re.IGNORECASE)
-    if eng_keyword:
-        clean_eng = re.escape(eng_keyword)
-        text = re.sub(f"({clean_eng})", r"**\1**", text, flags=re.IGNORECASE)
-    return text
+    terms = sorted(tokens, key=len, reverse=True)
+    pattern = "|".join(re.escape(t) if t[0] >= '가' else rf"(?<![0-9a-z]){re.escape(t)}(?![0-9a-z])" for t in terms)
+    # 겹치는 토큰('충전', '전기')도 모두 찾아 구간을 합침
+    spans = []
+    for m in re.finditer(f"(?=({pattern}))", text, flags=re.IGNORECASE):
+        start, end = m.start(), m.start() + len(m.group(1))
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    parts, last = [], 0
+    for start, end in spans:
+        parts += [text[last:start], "**", text[start:end], "**"]
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
 
-@st.cache_data(ttl=600)
-def get_cached_faq_data(table_name):
-    conn = get_db()
+def get_faq_index_or_none(conn):
+    """모든 FAQ를 한 번에 읽어 둔 검색 인덱스. 불러오지 못하면 오류를 표시하고 None을 반환합니다."""
     try:
-        with conn.cursor() as cursor:
-            sql = f"SELECT * FROM {table_name}"
-            cursor.execute(sql)
-            columns = [column[0] for column in cursor.description]
-            result = cursor.fetchall()
-            return pd.DataFrame(result, columns=columns)
+        return get_faq_index(conn)
     except Exception as e:
         st.error(f"데이터를 불러오는 중 오류가 발생했습니다: {e}")
-        return pd.DataFrame()
+        return None
 
 # --- 2. 메인 렌더링 함수 ---
 def render_faq_page(conn=None):
@@ -56,17 +65,9 @@ def render_faq_page(conn=None):
                  caption="Welcome to EV FAQ Service", width=700)
         return
 
-    # 브랜드에 따른 테이블 매핑
-    table_mapping = {
-        "KIA": "kia_faq", 
-        "BMW": "bmw_faq", 
-        "Tesla": "tesla_faq", 
-        "BYD": "byd_faq"
-    }
-    target_table = table_mapping[brand_option]
-
-    # 데이터 로딩
-    df = get_cached_faq_data(target_table)
+    # 데이터 로딩 (모든 브랜드 FAQ를 한 번에 읽어 두므로 브랜드를 바꿔도 DB를 다시 조회하지 않음)
+    index = get_faq_index_or_none(conn or get_db())
+    df = index.documents(brand_option) if index is not None else pd.DataFrame()
 
     if df.empty:
         st.warning("데이터가 없거나 불러올 수 없습니다.")
@@ -74,45 +75,38 @@ def render_faq_page(conn=None):
 
     # 검색 창
     search_term = st.text_input("🔍 키워드 검색 (예: 충전, 배터리)", "", key="faq_search_input")
-    eng_search_term = TRANSLATION_MAP.get(search_term, None)
+    search_all = st.checkbox("모든 브랜드에서 검색", key="faq_search_all")
+    # 검색에 쓴 토큰(동의어 포함) 그대로 강조
+    tokens = tuple(sorted({t for t, _ in search_tokens(search_term)}))
 
-    # 필터링 로직
+    # 검색어가 있으면 질문/답변 전체에서 관련도 순으로 검색
     if search_term:
-        mask = df['question'].str.contains(search_term, case=False, na=False)
-        if eng_search_term:
-            mask = mask | df['question'].str.contains(eng_search_term, case=False, na=False)
-        display_df = df[mask]
+        display_df = index.search(search_term, k=FAQ_TOP_K, sources=None if search_all else [brand_option])
+        if search_all:
+            display_df['question'] = "[" + display_df['source'].astype(str) + "] " + display_df['question']
     else:
         display_df = df
 
     if search_term:
-        st.caption(f"'{search_term}' 관련 질문이 {len(display_df)}건 검색되었습니다.")
+        st.caption(f"'{search_term}' 관련 질문이 {len(display_df)}건 검색되었습니다. (관련도 순, 최대 {FAQ_TOP_K}건)")
 
     # --- 출력 방식 결정 ---
-    # KIA와 Tesla만 카테고리 탭 구성을 사용합니다.
-    if brand_option in ["KIA", "Tesla"] and not display_df.empty and 'category' in display_df.columns:
+    # KIA와 Tesla만 카테고리 선택을 사용합니다. (선택한 카테고리만 그림)
+    category = "전체"
+    if brand_option in ["KIA", "Tesla"] and not (search_term and search_all) and not display_df.empty:
         raw_categories = display_df['category'].unique().tolist()
-        categories = [c for c in raw_categories if c] 
-        
-        tab_titles = ["전체"] + categories
-        tabs = st.tabs(tab_titles)
-        
-        for i, tab in enumerate(tabs):
-            with tab:
-                tab_df = display_df if tab_titles[i] == "전체" else display_df[display_df['category'] == tab_titles[i]]
-                if tab_df.empty:
-                    st.write("결과가 없습니다.")
-                else:
-                    for _, row in tab_df.iterrows():
-                        q = highlight_keyword(row['question'], search_term, eng_search_term)
-                        with st.expander(q):
-                            st.write(row['answer'])
-    else:
-        # BMW와 BYD는 카테고리 없이 바로 전체 리스트 출력
-        if display_df.empty:
-            st.warning("결과가 없습니다.")
-        else:
-            for _, row in display_df.iterrows():
-                q = highlight_keyword(row['question'], search_term, eng_search_term)
-                with st.expander(q):
-                    st.write(row['answer'])
\ No newline at end of file
+        categories = [c for c in raw_categories if c]
+        category = st.radio("카테고리", ["전체"] + categories, horizontal=True, key="faq_category")
+        if category not in ("전체", None):
+            display_df = display_df[display_df['category'] == category]
+
+    if display_df.empty:
+        st.warning("결과가 없습니다.")
+        return
+
+    # 현재 페이지의 행만 (질문, 답변) 튜플로 꺼내 출력
+    start, end = paginate(len(display_df), "faq", reset_on=(brand_option, search_term, search_all, category))
+    page_df = display_df.iloc[start:end]
+    for question, answer in zip(page_df['question'], page_df['answer']):
+        with st.expander(highlight_keyword(question, tokens)):
+            st.write(answer)
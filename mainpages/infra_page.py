@@ -1,6 +1,148 @@
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import altair as alt
+from utils.address import SIDO_ALIASES
+from utils.db import table_version
+from utils.parquet_cache import cached_read_sql
+from mainpages.map_page import F1_ADDR_COL, find_station_files, load_data, station_input_key
+
+# 차종별 대수 열 (total은 합계)
+MEASURES = ['passenger', 'bus', 'truck', 'special', 'total']
+TYPE_LABELS = {'passenger': '승용', 'bus': '승합', 'truck': '화물', 'special': '특수'}
+
+
+def split_region(region):
+    """'경북 포항시' 형태의 지역명을 (표준 시도명, 시군구) 두 열로 나눕니다. (벡터 연산)"""
+    parts = region.fillna('').astype(str).str.strip().str.split(n=1, expand=True).reindex(columns=[0, 1])
+    sido = parts[0].fillna('')
+    # 시도 약칭('경북', '전북' 등)은 주소 정규화와 같은 표준 이름으로 통일
+    sido = sido.map(SIDO_ALIASES).fillna(sido)
+    sigungu = parts[1].fillna('').str.strip()
+    return sido, sigungu
+
+
+def region_keys(text):
+    """지역명/주소 앞부분을 (표준 시도명, 시군구) 결합 키로 바꿉니다. (벡터 연산)
+
+    시군구는 시도 다음 첫 단어만 사용합니다. ('천안시 동남구' → '천안시')
+    시군구가 없는 세종특별자치시는 시군구를 비워 둡니다.
+    """
+    sido, rest = split_region(text)
+    sigungu = rest.str.split(n=1).str[0].fillna('')
+    sigungu = sigungu.where(sido != '세종특별자치시', '')
+    return sido, sigungu
+
+
+class RegistrationCube:
+    """(시도, 시군구, 용도)별 차종 대수 합계 큐브와 자주 쓰는 집계
+
+    ev_registration 데이터 버전이 바뀔 때만 다시 만들고, 화면에서는 만들어 둔 집계를 잘라 보여줍니다.
+    """
+
+    DIMENSIONS = ['sido', 'sigungu', 'usage_type']
+
+    def __init__(self, df):
+        df = df.copy()
+        df['sido'], df['sigungu'] = split_region(df['region'])
+        df[MEASURES] = df[MEASURES].apply(pd.to_numeric, errors='coerce').fillna(0)
+        self.raw = df
+
+        # 용도가 비어 있는 행도 전체 합계에 포함되도록 dropna=False
+        self.cube = df.groupby(self.DIMENSIONS, sort=True, dropna=False)[MEASURES].sum()
+        self.totals = self.cube.sum()
+        self.by_sido = self.cube.groupby(level='sido').sum().sort_values('total', ascending=False)
+        self.by_usage = self.cube.groupby(level='usage_type').sum()
+        self.by_sigungu = self.cube.groupby(level=['sido', 'sigungu']).sum()
+        self.sidos = self.by_sido.index.tolist()
+
+    @property
+    def empty(self):
+        return self.cube.empty
+
+    def usage_total(self, usage_type):
+        return self.by_usage['total'].get(usage_type, 0)
+
+    def drill(self, sido, usage_type=None):
+        """시도 하나의 시군구별 대수 (usage_type을 주면 해당 용도만)"""
+        if usage_type is None:
+            rows = self.by_sigungu.xs(sido, level='sido')
+        else:
+            rows = self.cube.xs((sido, usage_type), level=['sido', 'usage_type'])
+        return rows.sort_values('total', ascending=False)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_registration_cube(version, _conn):
+    return RegistrationCube(cached_read_sql("SELECT * FROM ev_registration", _conn, "ev_registration"))
+
+
+def get_registration_cube(conn):
+    """ev_registration 데이터 버전이 바뀔 때만 다시 만드는 등록 현황 큐브"""
+    return _build_registration_cube(table_version(conn, "ev_registration"), conn)
+
+
+class ChargerDensity:
+    """지역별 전기차 등록 대수와 한전 충전소 수를 결합한 충전소당 전기차 대수
+
+    값이 클수록 충전 인프라가 부족한 지역입니다. 충전소가 없는 지역은 가장 부족한 것으로 봅니다.
+    """
+
+    def __init__(self, cube, addresses):
+        # 등록 대수: 이미 집계된 (시도, 시군구) 합계를 결합 키로 다시 묶음
+        ev = cube.by_sigungu['total'].reset_index()
+        ev['sido'], ev['sigungu'] = region_keys(ev['sido'] + ' ' + ev['sigungu'])
+        ev = ev.groupby(['sido', 'sigungu'])['total'].sum()
+
+        # 충전소 수: 충전소주소에서 같은 방식으로 만든 키별 개수
+        sido, sigungu = region_keys(pd.Series(addresses, dtype=object))
+        stations = pd.DataFrame({'sido': sido, 'sigungu': sigungu})
+        stations = stations[stations['sido'] != ''].value_counts(['sido', 'sigungu'])
+
+        self.by_sigungu = self._ratio(ev, stations)
+        self.by_sido = self._ratio(ev.groupby(level='sido').sum(), stations.groupby(level='sido').sum())
+        self.total_ev = ev.sum()
+        self.total_stations = stations.sum()
+
+    @staticmethod
+    def _ratio(ev, stations):
+        table = pd.DataFrame({'ev': ev, 'stations': stations}).fillna(0).astype('int64')
+        # 등록 대수가 없는 지역(충전소만 있는 지역)은 비교 대상에서 제외
+        table = table[table['ev'] > 0]
+        with np.errstate(divide='ignore'):
+            table['ratio'] = table['ev'] / table['stations']
+        table = table.sort_values(['ratio', 'ev'], ascending=False, kind='stable')
+        table['ratio'] = table['ratio'].replace(np.inf, np.nan)
+        return table.reset_index()
+
+    @property
+    def national_ratio(self):
+        return self.total_ev / self.total_stations if self.total_stations else float('nan')
+
+    def sigungu_of(self, sido):
+        return self.by_sigungu[self.by_sigungu['sido'] == sido]
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_charger_density(registration_version, station_version, _conn, _kepco_files):
+    cube = get_registration_cube(_conn)
+    stations = load_data(_kepco_files)
+    return ChargerDensity(cube, stations[F1_ADDR_COL])
+
+
+def get_charger_density(conn):
+    """등록 데이터 버전과 한전 충전소 파일 버전이 모두 같으면 결합 결과를 재사용합니다.
+
+    한전 파일이 없으면 None을 반환합니다.
+    """
+    kepco_files, _ = find_station_files()
+    if not kepco_files:
+        return None
+    paths = tuple(p for _, p in kepco_files)
+    station_version = station_input_key(paths, tuple(os.path.getmtime(p) for p in paths))
+    return _build_charger_density(table_version(conn, "ev_registration"), station_version, conn, kepco_files)
+
 
 def render_infra_page(conn):
     st.title("⚡ 전기차 등록 현황")
@@ -8,32 +150,19 @@ def render_infra_page(conn):
     st.divider()
     
     try:
-        query = "SELECT * FROM ev_registration"
-        df = pd.read_sql(query, conn)
+        cube = get_registration_cube(conn)
     except Exception as e:
         st.error(f"데이터를 불러오는 중 오류가 발생했습니다: {e}")
         return
     
-    if df.empty:
+    if cube.empty:
         st.warning("데이터가 없습니다. DB에 데이터가 저장되었는지 확인해주세요.")
         return
-    
-    df['sido'] = df['region'].apply(lambda x: x.split()[0] if isinstance(x, str) else x)
-
-    name_map = {
-        '경북': '경상북도',
-        '경남': '경상남도',
-        '전북': '전북특별자치도',
-        '전남': '전라남도',
-        '충북': '충청북도',
-        '충남': '충청남도'
-    }
-    df['sido'] = df['sido'].replace(name_map)
 
     # 3. 핵심 지표 (Metrics) 표시
-    total_cars = df['total'].sum()
-    total_passenger = df['passenger'].sum()
-    total_commercial = df[df['usage_type'] == '사업용']['total'].sum()
+    total_cars = cube.totals['total']
+    total_passenger = cube.totals['passenger']
+    total_commercial = cube.usage_total('사업용')
 
     col1, col2, col3 = st.columns(3)
     col1.metric("총 등록 대수", f"{total_cars:,.0f} 대")
@@ -43,13 +172,13 @@ def render_infra_page(conn):
     st.markdown("---")
 
 
-    tab1, tab2, tab3 = st.tabs(["🗺️ 지역별 현황", "📊 차종/용도 분석", "📋 상세 데이터"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🗺️ 지역별 현황", "🔎 시군구별 현황", "🔌 충전소당 등록 대수", "📊 차종/용도 분석", "📋 상세 데이터"])
 
     with tab1:
         st.subheader("지역별 전기차 등록 순위")
         
         # 시도별 합계 계산
-        sido_grp = df.groupby('sido')['total'].sum().reset_index().sort_values('total', ascending=False)
+        sido_grp = cube.by_sido['total'].reset_index()
         
         # Altair 바 차트
         chart_sido = alt.Chart(sido_grp).mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3).encode(
@@ -62,16 +191,17 @@ def render_infra_page(conn):
         st.altair_chart(chart_sido, use_container_width=True)
 
     with tab2:
+        render_sigungu_drilldown(cube)
+
+    with tab3:
+        render_charger_density(conn)
+
+    with tab4:
         col_chart1, col_chart2 = st.columns(2)
         
         with col_chart1:
             st.subheader("차종별 구성")
-            type_sum = df[['passenger', 'bus', 'truck', 'special']].rename(columns={
-                'passenger': '승용',
-                'bus': '승합',
-                'truck': '화물',
-                'special': '특수'
-            }).sum().reset_index()
+            type_sum = cube.totals[list(TYPE_LABELS)].rename(TYPE_LABELS).reset_index()
             type_sum.columns = ['차종', '대수']
             
             chart_pie = alt.Chart(type_sum).    mark_arc(innerRadius=60).encode(
@@ -84,7 +214,7 @@ def render_infra_page(conn):
             
         with col_chart2:
             st.subheader("용도별 구성 (사업/비사업)")
-            usage_grp = df.groupby('usage_type')['total'].sum().reset_index()
+            usage_grp = cube.by_usage['total'].reset_index()
             
             chart_usage = alt.Chart(usage_grp).mark_bar().encode(
                 x=alt.X('usage_type', title='용도'),
@@ -95,7 +225,87 @@ def render_infra_page(conn):
             
             st.altair_chart(chart_usage, use_container_width=True)
 
-    with tab3:
+    with tab5:
         st.subheader("원천 데이터 조회")
         with st.expander("데이터프레임 열기"):
-            st.dataframe(df, use_container_width=True)
\ No newline at end of file
+            st.dataframe(cube.raw, use_container_width=True)
+
+
+def render_sigungu_drilldown(cube):
+    st.subheader("시군구별 전기차 등록 현황")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        sido = st.selectbox("시도 선택", cube.sidos, key="infra_sido")
+    with col2:
+        usage = st.radio("용도", ["전체", "사업용", "비사업용"], horizontal=True, key="infra_usage")
+
+    rows = cube.drill(sido, None if usage == "전체" else usage)
+    if rows.empty:
+        st.info("해당 조건의 등록 데이터가 없습니다.")
+        return
+
+    sigungu_grp = rows['total'].reset_index()
+    chart_sigungu = alt.Chart(sigungu_grp).mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3).encode(
+        x=alt.X('sigungu', sort='-y', title='시군구'),
+        y=alt.Y('total', title='등록 대수'),
+        tooltip=['sigungu', alt.Tooltip('total', format=',')]
+    ).properties(height=350)
+    st.altair_chart(chart_sigungu, use_container_width=True)
+
+    table = rows.rename(columns={**TYPE_LABELS, 'total': '합계'}).rename_axis('시군구').reset_index()
+    st.dataframe(table, use_container_width=True, hide_index=True)
+
+
+DENSITY_COLUMNS = {'sido': '시도', 'sigungu': '시군구', 'ev': '전기차 등록 대수', 'stations': '충전소 수', 'ratio': '충전소당 전기차'}
+
+
+def render_charger_density(conn):
+    st.subheader("충전소 1곳당 전기차 등록 대수")
+    st.caption("전기차 등록 현황과 한전 충전소 위치 정보를 시도/시군구별로 결합했습니다. 값이 클수록 충전 인프라가 부족한 지역입니다.")
+
+    try:
+        density = get_charger_density(conn)
+    except Exception as e:
+        st.error(f"충전소 데이터를 불러오는 중 오류가 발생했습니다: {e}")
+        return
+    if density is None:
+        st.info("'한국전력공사' 충전소 파일이 없어 충전소당 등록 대수를 계산할 수 없습니다.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("전기차 등록 대수", f"{density.total_ev:,.0f} 대")
+    col2.metric("충전소 수", f"{density.total_stations:,.0f} 곳")
+    col3.metric("전국 충전소당 전기차", f"{density.national_ratio:,.1f} 대")
+
+    level = st.radio("단위", ["시도", "시군구"], horizontal=True, key="density_level")
+    if level == "시도":
+        table = density.by_sido
+    else:
+        sidos = ["전체"] + density.by_sido['sido'].tolist()
+        sido = st.selectbox("시도 선택", sidos, key="density_sido")
+        table = density.by_sigungu if sido == "전체" else density.sigungu_of(sido)
+
+    if table.empty:
+        st.info("해당 지역의 데이터가 없습니다.")
+        return
+
+    label = 'sido' if level == "시도" else 'sigungu'
+    named = table.assign(sigungu=table['sido'] + ' ' + table['sigungu']) if level == "시군구" else table
+    # 충전소가 없는 지역은 비율이 없으므로 막대 대신 따로 나열
+    no_station = named[named['ratio'].isna()]
+    if not no_station.empty:
+        st.warning(f"충전소가 한 곳도 없는 지역 ({len(no_station)}곳): " + ", ".join(no_station[label]))
+    top = named.dropna(subset=['ratio']).head(15)
+    chart = alt.Chart(top).mark_bar(cornerRadiusTopLeft=3, cornerRadiusTopRight=3).encode(
+        x=alt.X(label, sort='-y', title=DENSITY_COLUMNS[label]),
+        y=alt.Y('ratio', title='충전소당 전기차 (대)'),
+        tooltip=[label, alt.Tooltip('ev', format=','), alt.Tooltip('stations', format=','), alt.Tooltip('ratio', format=',.1f')]
+    ).properties(height=350)
+    if not top.empty:
+        st.altair_chart(chart, use_container_width=True)
+
+    if not no_station.empty:
+        st.caption("표에서는 충전소가 없는 지역을 가장 부족한 지역으로 맨 앞에 표시합니다. (값 없음)")
+    columns = [c for c in DENSITY_COLUMNS if c in table.columns and not (level == "시도" and c == 'sigungu')]
+    st.dataframe(table[columns].rename(columns=DENSITY_COLUMNS), use_container_width=True, hide_index=True)
@@ -1,11 +1,17 @@
 import os
-import unicodedata
+import json
+import functools
 import pandas
 import folium
 import streamlit
 import streamlit_folium
-import copy
-from folium.plugins import MarkerCluster
+from branca.element import MacroElement
+from folium.template import Template
+from utils.address import AddressIndex
+from utils.artifact_cache import ArtifactCache, input_key
+from utils.csv_cache import read_csv_cached
+from utils.spatial import GridIndex
+from utils.station_store import StationStore, list_dated_files
 
 # --- 설정 ---
 # 현재 스크립트 파일의 위치를 기준으로 'data' 폴더의 경로를 설정합니다.
@@ -17,25 +23,13 @@ CURRENT_SCRIPT_PATH = os.path.abspath(__file__)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_SCRIPT_PATH))
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 
-def find_file_by_keyword(directory, keyword):
-    """지정된 디렉토리에서 키워드를 포함하는 첫 번째 파일의 전체 경로를 반환합니다."""
-    try:
-        # 키워드를 NFC 형식으로 정규화
-        normalized_keyword = unicodedata.normalize('NFC', keyword)
-        for filename in os.listdir(directory):
-            # 파일 이름을 NFC 형식으로 정규화
-            normalized_filename = unicodedata.normalize('NFC', filename)
-            if normalized_keyword in normalized_filename and normalized_filename.endswith('.csv'):
-                return os.path.join(directory, filename)
-    except FileNotFoundError:
-        return None
-    return None
-
-# 키워드로 동적으로 파일 경로 찾기
-FILE1_PATH = find_file_by_keyword(DATA_DIR, '한국전력공사')
-FILE2_PATH = find_file_by_keyword(DATA_DIR, '한국환경공단')
+def find_station_files():
+    """data 폴더의 한전 날짜별 파일 목록과 가장 최근 환경공단 파일 경로(없으면 None)를 반환합니다."""
+    kepco_files = list_dated_files(DATA_DIR, '한국전력공사')
+    keco_files = list_dated_files(DATA_DIR, '한국환경공단')
+    return kepco_files, (keco_files[-1][1] if keco_files else None)
 
-# 열 이름 매핑
+F1_ID_COL = '충전소아이디'
 F1_LAT_COL = '위도'
 F1_LON_COL = '경도'
 F1_NAME_COL = '충전소명'
@@ -47,139 +41,430 @@ F2_ADDR_COL = '주소'
 F2_MODEL_L_COL = '기종(대)'
 F2_MODEL_S_COL = '기종(소)'
 
+# 파일별로 읽을 열과 dtype (반복이 많은 값은 category로 저장)
+F1_COLUMNS = {
+    F1_ID_COL: 'object',
+    F1_NAME_COL: 'object',
+    F1_ADDR_COL: 'object',
+    F1_ADDR_DETAIL_COL: 'object',
+    F1_LAT_COL: 'float64',
+    F1_LON_COL: 'float64',
+    F1_HOURS_COL: 'category',
+}
+F2_COLUMNS = {
+    F2_ADDR_COL: 'object',
+    F2_MODEL_L_COL: 'category',
+    F2_MODEL_S_COL: 'category',
+}
+
+# 한전 날짜별 파일을 충전소아이디 기준으로 병합해 두는 저장소
+KEPCO_STORE = StationStore('kepco', F1_ID_COL, F1_COLUMNS)
+
+# 지도용 충전소 표의 형식(열/가공 방식)이 바뀌면 올려서 저장된 아티팩트를 다시 만들게 함
+RENDERER_VERSION = 1
+MAP_ARTIFACTS = ArtifactCache('station_map', RENDERER_VERSION)
+
 # --- 데이터 로딩 및 지도 생성 함수 ---
+# 아래 로딩 함수들은 백그라운드 스레드에서도 실행되므로 streamlit 호출 없이 작성함
 
-@streamlit.cache_data
-def load_data(file1, file2):
-    """CSV 파일들을 읽어 데이터프레임으로 반환합니다. (데이터 캐싱)"""
+def load_data(kepco_files):
+    """한전 날짜별 파일을 병합한 현재 충전소 표를 반환합니다."""
     print("Reading CSV files...")
-    try:
-        df1 = pandas.read_csv(file1, encoding='cp949', on_bad_lines='skip')
-
-        # --- 사용자가 제공한 주소를 기반으로 정확한 필터링 ---
-        address_to_remove = '강원특별자치도 동해시 이로동 183-2'
-        mask = (df1[F1_ADDR_COL] == address_to_remove)
-        
-        if mask.any():
-            print(f"Found and removed {mask.sum()} incorrect data point(s) for address: '{address_to_remove}'")
-            df1 = df1[~mask].copy()
-        else:
-            print(f"Warning: Could not find the incorrect data point to remove for address: '{address_to_remove}'")
+    # 새 날짜 파일만 병합하고, 현재 충전소 표를 읽음
+    merged = KEPCO_STORE.update(list(kepco_files))
+    if merged:
+        print(f"Merged {merged} new KEPCO file(s)")
+    df1 = KEPCO_STORE.stations()
 
-        df1.dropna(subset=[F1_LAT_COL, F1_LON_COL], inplace=True)
-        # --- 필터링 종료 ---
+    # --- 사용자가 제공한 주소를 기반으로 정확한 필터링 ---
+    address_to_remove = '강원특별자치도 동해시 이로동 183-2'
+    mask = (df1[F1_ADDR_COL] == address_to_remove)
 
-        df2 = pandas.read_csv(file2, encoding='cp949', on_bad_lines='skip')
-        print("Files read successfully.")
-        return df1, df2
-    except FileNotFoundError as e:
-        streamlit.error(f"데이터 파일을 찾을 수 없습니다: {e.filename}")
-        return None, None
-    except Exception as e:
-        streamlit.error(f"데이터 파일을 읽는 중 오류가 발생했습니다: {e}")
-        return None, None
-
-@streamlit.cache_resource
-def generate_map(_df1, _df2):
-    """데이터프레임을 기반으로 Folium 지도 객체를 생성합니다. (리소스 캐싱)"""
-    print("Generating map from scratch...")
-    # df2에서 중복 주소를 제거하고 필요한 열만 선택
-    df2_unique = _df2.drop_duplicates(subset=[F2_ADDR_COL])[[F2_ADDR_COL, F2_MODEL_L_COL, F2_MODEL_S_COL]]
-
-    # df1과 df2_unique를 주소 기준으로 left join
-    merged_df = pandas.merge(
-        _df1,
-        df2_unique,
-        left_on=F1_ADDR_COL,
-        right_on=F2_ADDR_COL,
-        how='left'
+    if mask.any():
+        print(f"Found and removed {mask.sum()} incorrect data point(s) for address: '{address_to_remove}'")
+        df1 = df1[~mask]
+    else:
+        print(f"Warning: Could not find the incorrect data point to remove for address: '{address_to_remove}'")
+
+    df1 = df1.dropna(subset=[F1_LAT_COL, F1_LON_COL])
+    # --- 필터링 종료 ---
+    print("Files read successfully.")
+    return df1
+
+
+@functools.lru_cache(maxsize=2)
+def load_keco_data(file2, mtime):
+    """환경공단 데이터와 주소 키 해시 인덱스를 파일마다 한 번만 만듭니다."""
+    # 필요한 열만 읽고, 두 번째 실행부터는 Parquet 캐시를 사용
+    df2 = read_csv_cached(file2, F2_COLUMNS)
+    if df2.attrs['rejected_lines']:
+        print(f"Skipped {len(df2.attrs['rejected_lines'])} malformed line(s) in {os.path.basename(file2)}")
+    return df2, AddressIndex(df2[F2_ADDR_COL])
+
+# 지도 초기 위치
+KOREA_CENTER = [36.5, 127.5]
+INITIAL_ZOOM = 7
+# 이 줌 이상에서만 개별 마커를 보냄 (그 아래는 격자별 개수만)
+DETAIL_ZOOM = 12
+# 한 번에 보낼 개별 마커 최대 개수 (넘으면 개수 표시로 대체)
+MAX_MARKERS = 2000
+# st_folium 컴포넌트 키 (지도의 현재 영역/줌을 session_state에서 읽을 때 사용)
+MAP_KEY = "station_map"
+
+# 브라우저에서 팝업 HTML을 만들 때 쓰는 공통 함수 (d: 열 단위 충전소 배열)
+_POPUP_JS = """
+    var escape = function (value) {
+        if (value === null || value === undefined) { return 'N/A'; }
+        return String(value).replace(/[&<>"']/g, function (c) {
+            return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+        });
+    };
+    var popup = function (layer) {
+        var i = layer.options.row;
+        var html = '<b>' + escape(d.name[i]) + '</b><br>'
+            + '<b>주소:</b> ' + escape(d.address[i]) + '<br>'
+            + '<b>상세주소:</b> ' + escape(d.detail[i]);
+        if (d.matched[i]) {
+            html += '<br><b>기종(대):</b> ' + escape(d.model_l[i])
+                + '<br><b>기종(소):</b> ' + escape(d.model_s[i]);
+        }
+        return html + '<br><b>이용시간:</b> ' + escape(d.hours[i]);
+    };
+"""
+
+
+class StationLayer(MacroElement):
+    """직렬화된 충전소 배열(JSON)을 받아 브라우저에서 마커와 팝업을 만드는 레이어.
+
+    파이썬에서는 마커 객체를 만들지 않고, 열 단위 배열 하나만 HTML에 넣습니다.
+    팝업 HTML은 마커를 클릭할 때 브라우저에서 만들어집니다.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var d = {{ this.payload_json }};
+                """ + _POPUP_JS + """
+                // 0: 한전 데이터만 (회색), 1: 환경공단 기종 정보 있음 (파란색)
+                var icons = [
+                    L.AwesomeMarkers.icon({icon: 'charging-station', prefix: 'fa', markerColor: 'gray'}),
+                    L.AwesomeMarkers.icon({icon: 'charging-station', prefix: 'fa', markerColor: 'blue'})
+                ];
+                for (var i = 0; i < d.lat.length; i++) {
+                    L.marker([d.lat[i], d.lon[i]], {icon: icons[d.matched[i]], row: i})
+                        .bindPopup(popup, {maxWidth: 300})
+                        .addTo({{ this._parent.get_name() }});
+                }
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, payload_json):
+        super().__init__()
+        self._name = "StationLayer"
+        self.payload_json = payload_json
+
+
+class StationCountLayer(MacroElement):
+    """격자별 충전소 개수를 원형 아이콘으로 표시하는 레이어. 클릭하면 그 위치로 확대합니다."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var d = {{ this.payload_json }};
+                for (var i = 0; i < d.lat.length; i++) {
+                    var n = d.count[i];
+                    var size = n < 10 ? 28 : (n < 100 ? 34 : (n < 1000 ? 42 : 50));
+                    var html = '<div style="width:100%;height:100%;border-radius:50%;'
+                        + 'background:rgba(78,205,196,0.85);border:2px solid #fff;color:#fff;'
+                        + 'font-weight:bold;font-size:12px;display:flex;align-items:center;justify-content:center;">'
+                        + n.toLocaleString() + '</div>';
+                    L.marker([d.lat[i], d.lon[i]], {
+                        icon: L.divIcon({html: html, className: '', iconSize: [size, size]})
+                    }).on('click', function (e) {
+                        e.target._map.setView(e.latlng, e.target._map.getZoom() + 2);
+                    }).addTo({{ this._parent.get_name() }});
+                }
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, payload_json):
+        super().__init__()
+        self._name = "StationCountLayer"
+        self.payload_json = payload_json
+
+
+def _to_json(payload):
+    # <script> 태그 안에 그대로 넣으므로 '</'가 태그를 닫지 않도록 이스케이프
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+
+def _column_values(series):
+    """NaN을 None으로 바꾼 파이썬 리스트 (JSON null로 직렬화됨)"""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def join_model_info(df1, df2, address_index):
+    """df1 각 행에 주소 키가 같은 df2 행의 기종 정보를 붙인 (기종(대), 기종(소)) 열을 반환합니다."""
+    model_l = pandas.Series(None, index=df1.index, dtype=object)
+    model_s = pandas.Series(None, index=df1.index, dtype=object)
+    if df2 is None:
+        return model_l, model_s
+    rows = address_index.match(df1[F1_ADDR_COL])
+    found = rows >= 0
+    model_l[found] = df2[F2_MODEL_L_COL].to_numpy(dtype=object)[rows[found]]
+    model_s[found] = df2[F2_MODEL_S_COL].to_numpy(dtype=object)[rows[found]]
+    return model_l, model_s
+
+
+def build_station_table(kepco_files, keco_file):
+    """두 기관 데이터를 결합한 지도용 충전소 표를 만듭니다. (MAP_ARTIFACTS에 저장됨)
+
+    환경공단 파일이 없으면(keco_file=None) 기종 정보 없이 만듭니다.
+    한쪽 파일만 바뀌면 다른 쪽 주소 인덱스와 이미 정규화한 주소 키는 그대로 재사용됩니다.
+    """
+    df1 = load_data(kepco_files)
+    df2, address_index = load_keco_data(keco_file, os.path.getmtime(keco_file)) if keco_file else (None, None)
+
+    print("Building station table...")
+    # 주소를 정규화한 키로 df2의 기종 정보를 결합 (표기 차이로 놓치던 충전소도 결합됨)
+    model_l, model_s = join_model_info(df1, df2, address_index)
+
+    # 조인된 데이터(기종 정보)가 있는지 확인 (NaN이 아닌지 체크)
+    matched = model_l.notna() | model_s.notna()
+
+    stations = pandas.DataFrame({
+        'lat': df1[F1_LAT_COL].astype(float).round(6),
+        'lon': df1[F1_LON_COL].astype(float).round(6),
+        'matched': matched.astype(int),
+        'name': df1[F1_NAME_COL],
+        'address': df1[F1_ADDR_COL],
+        'detail': df1[F1_ADDR_DETAIL_COL],
+        'model_l': model_l,
+        'model_s': model_s,
+        'hours': df1[F1_HOURS_COL],
+    }).reset_index(drop=True)
+    # 화면에 표시할 안내 정보도 함께 저장
+    stations.attrs = {
+        'history': KEPCO_STORE.manifest()['files'],
+        'has_model_info': df2 is not None,
+        'rejected': len(df2.attrs['rejected_lines']) if df2 is not None else 0,
+    }
+    return stations
+
+
+@streamlit.cache_data
+def station_input_key(paths, stamp):
+    """입력 파일 해시로 만든 아티팩트 키 (stamp는 파일 수정 시각 목록으로, 캐시 갱신용)"""
+    return input_key(paths, RENDERER_VERSION)
+
+
+@streamlit.cache_resource(max_entries=2)
+def load_station_index(artifact_path):
+    """저장된 충전소 표와 공간 격자 인덱스를 아티팩트마다 한 번만 만듭니다. (리소스 캐싱)"""
+    print("Building station index...")
+    stations = MAP_ARTIFACTS.read(artifact_path)
+    return stations, GridIndex(stations['lat'].to_numpy(), stations['lon'].to_numpy())
+
+
+def station_payload(stations, idx):
+    """선택된 충전소 행만 열 단위 JSON으로 직렬화합니다."""
+    subset = stations.iloc[idx]
+    return _to_json({col: _column_values(subset[col]) for col in subset.columns})
+
+
+def count_cell_deg(zoom):
+    """줌 레벨에서 화면상 약 64px 크기가 되는 격자 크기(도)"""
+    return 90.0 / (2 ** int(zoom))
+
+
+def current_view():
+    """지도 컴포넌트가 마지막으로 보고한 (남, 서, 북, 동) 영역과 줌. 처음에는 전체 영역."""
+    state = streamlit.session_state.get(MAP_KEY) or {}
+    zoom = state.get('zoom') or INITIAL_ZOOM
+    bounds = state.get('bounds') or {}
+    south_west = bounds.get('_southWest') or {}
+    north_east = bounds.get('_northEast') or {}
+    box = (south_west.get('lat'), south_west.get('lng'), north_east.get('lat'), north_east.get('lng'))
+    if any(v is None for v in box):
+        box = (-90.0, -180.0, 90.0, 180.0)
+    return box, zoom
+
+
+def build_view_layer(stations, index, box, zoom):
+    """현재 영역에 필요한 만큼만 담은 레이어와 안내 문구를 반환합니다.
+
+    확대된 상태에서는 영역 안의 개별 마커를, 그 외에는 격자별 개수만 보냅니다.
+    """
+    south, west, north, east = box
+    fg = folium.FeatureGroup(name="충전소")
+
+    if zoom >= DETAIL_ZOOM:
+        idx = index.query_bbox(south, west, north, east)
+        if len(idx) <= MAX_MARKERS:
+            StationLayer(station_payload(stations, idx)).add_to(fg)
+            return fg, f"현재 화면의 충전소 {len(idx):,}곳을 표시합니다."
+
+    lat, lon, count = index.aggregate(count_cell_deg(zoom))
+    # 화면 가장자리에 걸친 격자도 보이도록 한 칸만큼 여유를 둠
+    pad = count_cell_deg(zoom)
+    inside = (lat >= south - pad) & (lat <= north + pad) & (lon >= west - pad) & (lon <= east + pad)
+    StationCountLayer(_to_json({
+        'lat': lat[inside].round(6).tolist(),
+        'lon': lon[inside].round(6).tolist(),
+        'count': count[inside].tolist(),
+    })).add_to(fg)
+    return fg, f"현재 화면에 충전소 {int(count[inside].sum()):,}곳이 있습니다. 지도를 확대하면 개별 마커가 표시됩니다."
+
+
+def find_nearest_stations(stations, index, lat, lon, k=5):
+    """(lat, lon)에서 가까운 충전소 k곳을 거리순으로 반환합니다."""
+    idx, dist = index.nearest(lat, lon, k)
+    result = stations.iloc[idx][['name', 'address', 'detail', 'hours']].rename(columns={
+        'name': '충전소명',
+        'address': '주소',
+        'detail': '상세주소',
+        'hours': '이용가능시간',
+    })
+    result.insert(0, '거리(km)', dist.round(2))
+    result['환경공단 기종 정보'] = stations['matched'].to_numpy()[idx].astype(bool)
+    return result.reset_index(drop=True)
+
+
+def locate_address(stations, keyword):
+    """주소에 keyword가 포함된 충전소들의 중심 좌표를 반환합니다. 없으면 None."""
+    mask = stations['address'].str.contains(keyword, regex=False, na=False)
+    if not mask.any():
+        return None
+    return float(stations.loc[mask, 'lat'].mean()), float(stations.loc[mask, 'lon'].mean())
+
+
+def render_nearest_section(stations, index):
+    streamlit.subheader("📍 내 주변 충전소 찾기")
+
+    mode = streamlit.radio(
+        "위치 입력 방식", ["지도 클릭", "좌표 입력", "주소 검색"], horizontal=True, key="nearest_mode"
     )
+    k = streamlit.slider("찾을 충전소 수", min_value=1, max_value=20, value=5, key="nearest_k")
 
-    # --- itertuples() 에러 방지를 위해 컬럼명 변경 ---
-    sanitized_l_col = '기종_대'
-    sanitized_s_col = '기종_소'
-    merged_df.rename(columns={
-        F2_MODEL_L_COL: sanitized_l_col,
-        F2_MODEL_S_COL: sanitized_s_col
-    }, inplace=True)
-    # -----------------------------------------
-
-    # 지도 생성
-    korea_center = [36.5, 127.5]
-    m = folium.Map(location=korea_center, zoom_start=7)
-
-    # 성능 향상을 위해 MarkerCluster 사용
-    marker_cluster = MarkerCluster().add_to(m)
-
-    # itertuples()를 사용하여 반복 성능 향상
-    for row in merged_df.itertuples(index=False):
-        lat = getattr(row, F1_LAT_COL)
-        lon = getattr(row, F1_LON_COL)
-        address = getattr(row, F1_ADDR_COL, 'N/A')
-        detail_address = getattr(row, F1_ADDR_DETAIL_COL, 'N/A')
-        
-        popup_html = f"""
-        <b>{getattr(row, F1_NAME_COL, 'N/A')}</b><br>
-        <b>주소:</b> {address}<br>
-        <b>상세주소:</b> {detail_address}
-        """
-        
-        icon_symbol = 'charging-station'
-
-        # 조인된 데이터(기종 정보)가 있는지 확인 (NaN이 아닌지 체크)
-        model_l_val = getattr(row, sanitized_l_col, None)
-        model_s_val = getattr(row, sanitized_s_col, None)
-
-        if pandas.notna(model_l_val) or pandas.notna(model_s_val):
-            icon_color = 'blue'
-            model_l = model_l_val or 'N/A'
-            model_s = model_s_val or 'N/A'
-            popup_html += f"<br><b>기종(대):</b> {model_l}<br><b>기종(소):</b> {model_s}"
+    location = None
+    if mode == "지도 클릭":
+        clicked = (streamlit.session_state.get(MAP_KEY) or {}).get('last_clicked')
+        if clicked:
+            location = (clicked['lat'], clicked['lng'])
         else:
-            icon_color = 'gray'
-        
-        popup_html += f"<br><b>이용시간:</b> {getattr(row, F1_HOURS_COL, 'N/A')}"
-
-        folium.Marker(
-            location=[lat, lon],
-            popup=folium.Popup(popup_html, max_width=300),
-            icon=folium.Icon(color=icon_color, icon=icon_symbol, prefix='fa')
-        ).add_to(marker_cluster)
-    
-    return m
+            streamlit.info("위 지도에서 원하는 위치를 클릭해주세요.")
+    elif mode == "좌표 입력":
+        c1, c2 = streamlit.columns(2)
+        lat = c1.number_input("위도", value=37.5665, format="%.6f", key="nearest_lat")
+        lon = c2.number_input("경도", value=126.9780, format="%.6f", key="nearest_lon")
+        location = (lat, lon)
+    else:
+        keyword = streamlit.text_input("주소 검색", placeholder="예: 강남구 역삼동, 수원시 팔달구", key="nearest_address")
+        if keyword.strip():
+            location = locate_address(stations, keyword.strip())
+            if location is None:
+                streamlit.warning("해당 주소가 포함된 충전소를 찾을 수 없습니다.")
+
+    if location is None:
+        return
+
+    nearest = find_nearest_stations(stations, index, location[0], location[1], k)
+    streamlit.caption(f"기준 위치: 위도 {location[0]:.5f}, 경도 {location[1]:.5f}")
+    streamlit.dataframe(nearest, hide_index=True, use_container_width=True)
+
+
+def render_dataset_history(history):
+    """병합한 한전 파일 목록과 가장 최근 파일에서 바뀐 충전소 수를 보여줍니다."""
+    if not history:
+        return
+    latest = history[-1]
+    streamlit.caption(f"기준 데이터: {latest['name']} (날짜별 파일 {len(history)}개 병합)")
+    if len(history) < 2:
+        return
+
+    c1, c2, c3 = streamlit.columns(3)
+    c1.metric("신규 충전소", f"{latest['added']:,}곳")
+    c2.metric("폐지 충전소", f"{latest['removed']:,}곳")
+    c3.metric("정보 변경", f"{latest['changed']:,}곳")
+    with streamlit.expander("파일별 변경 이력"):
+        streamlit.dataframe(pandas.DataFrame(history)[['date', 'name', 'total', 'added', 'removed', 'changed']].rename(columns={
+            'date': '기준일',
+            'name': '파일',
+            'total': '충전소 수',
+            'added': '신규',
+            'removed': '폐지',
+            'changed': '변경',
+        }), hide_index=True, use_container_width=True)
+
+
+def generate_map():
+    """기본 지도 객체를 생성합니다. 마커는 build_view_layer의 레이어로 따로 전달합니다."""
+    return folium.Map(location=KOREA_CENTER, zoom_start=INITIAL_ZOOM)
 
 # --- 메인 스크립트 ---
 def render_map_page(conn):
     """메인 페이지를 렌더링하는 함수"""
-    # 파일 경로가 제대로 찾아졌는지 먼저 확인
-    if not FILE1_PATH or not FILE2_PATH:
+    # 파일 경로가 제대로 찾아졌는지 먼저 확인 (환경공단 파일은 없어도 됨)
+    kepco_files, keco_file = find_station_files()
+    if not kepco_files:
         streamlit.error(
-            f"데이터 폴더('{DATA_DIR}')에서 '한국전력공사' 또는 '한국환경공단' 키워드가 포함된 CSV 파일을 찾을 수 없습니다. "
+            f"데이터 폴더('{DATA_DIR}')에서 '한국전력공사' 키워드가 포함된 CSV 파일을 찾을 수 없습니다. "
             "streamlit을 실행하는 위치에 'data' 폴더가 있는지, 그 안에 파일이 있는지 확인해주세요."
         )
         return
 
     streamlit.header("전국 전기차 충전소 현황")
 
-    # 캐시된 함수를 통해 데이터 로딩
-    df1, df2 = load_data(FILE1_PATH, FILE2_PATH)
-
-    if df1 is None or df2 is None:
+    # 입력 파일이 그대로면 저장된 충전소 표를 바로 읽고, 바뀌었으면 이전 표를 보여주며 백그라운드에서 다시 만듦
+    paths = tuple(p for _, p in kepco_files) + ((keco_file,) if keco_file else ())
+    key = station_input_key(paths, tuple(os.path.getmtime(p) for p in paths))
+    try:
+        with streamlit.spinner("충전소 데이터를 준비하는 중입니다..."):
+            artifact_path, fresh = MAP_ARTIFACTS.resolve(key, lambda: build_station_table(kepco_files, keco_file))
+        stations, index = load_station_index(artifact_path)
+    except FileNotFoundError as e:
+        streamlit.error(f"데이터 파일을 찾을 수 없습니다: {e.filename}")
+        return
+    except Exception as e:
+        streamlit.error(f"데이터 파일을 읽는 중 오류가 발생했습니다: {e}")
         streamlit.warning("데이터를 불러오지 못해 지도를 표시할 수 없습니다.")
         return
 
-    # 캐시된 원본 지도 객체를 가져옴
-    cached_map = generate_map(df1, df2)
+    if not fresh:
+        streamlit.info("데이터 파일이 바뀌어 지도를 새로 만드는 중입니다. 잠시 후 새로고침하면 반영됩니다.")
+    if not stations.attrs.get('has_model_info', True):
+        streamlit.info("'한국환경공단' 파일이 없어 기종 정보 없이 한전 데이터만 표시합니다.")
 
-    # 화면에 렌더링할 때는 원본의 깊은 복사본을 사용
-    m = copy.deepcopy(cached_map)
+    # 캐시된 충전소 표/격자 인덱스로 현재 화면에 필요한 마커만 골라 보냄
+    box, zoom = current_view()
+    view_layer, view_message = build_view_layer(stations, index, box, zoom)
 
     # Streamlit에 지도 표시
+    # 기본 지도는 매번 같으므로 다시 그려지지 않고, 레이어만 현재 영역에 맞게 교체됨
     streamlit.write("지도에 충전소 위치가 표시됩니다. 마커를 클릭하여 상세 정보를 확인하세요.")
-    streamlit_folium.st_folium(m, width='100%', height=600, returned_objects=[])
+    streamlit_folium.st_folium(
+        generate_map(),
+        key=MAP_KEY,
+        width='100%',
+        height=600,
+        feature_group_to_add=view_layer,
+        returned_objects=['bounds', 'zoom', 'last_clicked'],
+    )
+    streamlit.caption(view_message)
+    history = stations.attrs.get('history', [])
+    rejected = (history[-1].get('rejected', 0) if history else 0) + stations.attrs.get('rejected', 0)
+    if rejected:
+        streamlit.caption(f"원본 CSV에서 형식이 맞지 않는 {rejected:,}개 행은 제외했습니다.")
 
     with streamlit.expander("범례 보기"):
         streamlit.markdown("""
         - <span style='color:blue; font-weight:bold;'>■ 파란색 마커</span>: 한전 및 환경공단 데이터에 모두 존재 (기종 정보 포함)
         - <span style='color:gray; font-weight:bold;'>■ 회색 마커</span>: 한전 데이터에만 존재
+        - <span style='color:#4ECDC4; font-weight:bold;'>● 숫자 원</span>: 해당 구역의 충전소 수 (클릭하면 확대)
         """, unsafe_allow_html=True)
+
+    render_dataset_history(history)
+
+    render_nearest_section(stations, index)
@@ -1,39 +1,167 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
+from utils.db import table_version
+from utils.parquet_cache import cached_read_sql
+from utils.faq_search import get_faq_index
+from utils.pagination import paginate
 
 @st.cache_data(ttl=3600)
 def get_all_region_subsidy(query, _conn):
-    return pd.read_sql(query, _conn)
+    return cached_read_sql(query, _conn, "ev_local_car_subsidy")
 
-@st.cache_data(ttl=3600)
-def get_model_options(_conn):
-    return pd.read_sql("SELECT * FROM ev_model_local_subsidy", _conn)
+MODEL_SUBSIDY_QUERY = "SELECT * FROM ev_model_local_subsidy"
+
+# 차종별 상세조회의 선택 단계 (지역 → 차종 → 제조사 → 모델)
+SUBSIDY_LEVELS = ["region_name", "vehicle_type", "manufacturer", "model_name"]
+
+
+class SubsidyIndex:
+    """지역 → 차종 → 제조사 → 모델 → 보조금 레코드 중첩 인덱스
+
+    각 단계의 선택지는 정렬된 목록으로 미리 만들어 두고, 마지막 조회는 딕셔너리 조회 한 번입니다.
+    같은 조합이 여러 행이면 첫 행을 사용합니다.
+    """
+
+    def __init__(self, df):
+        # (상위 선택값들) → 정렬된 하위 선택지 목록
+        self.choices = {}
+        # (지역, 차종, 제조사, 모델) → 레코드
+        self.records = {}
+        tree = {}
+        for rec in df.to_dict("records"):
+            key = tuple(rec[level] for level in SUBSIDY_LEVELS)
+            if key in self.records:
+                continue
+            self.records[key] = rec
+            node = tree
+            for value in key[:-1]:
+                node = node.setdefault(value, {})
+            node[key[-1]] = rec
+        self._collect(tree, ())
+
+    def _collect(self, node, path):
+        self.choices[path] = sorted(node)
+        if len(path) < len(SUBSIDY_LEVELS) - 1:
+            for value, child in node.items():
+                self._collect(child, path + (value,))
+
+    def options(self, *path):
+        """상위 선택값들(path) 아래의 정렬된 선택지 목록"""
+        return self.choices.get(tuple(path), [])
+
+    def lookup(self, region, vehicle_type, manufacturer, model):
+        return self.records.get((region, vehicle_type, manufacturer, model))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_subsidy_index(version, _conn):
+    # 버전을 확인하는 cached_read_sql로 읽어야 버전이 바뀐 직후에도 최신 데이터로 만듦
+    return SubsidyIndex(cached_read_sql(MODEL_SUBSIDY_QUERY, _conn, "ev_model_local_subsidy"))
+
+
+def get_subsidy_index(conn):
+    """
+    차종별 보조금 인덱스를 반환
+    ev_model_local_subsidy 데이터 버전이 바뀔 때만 다시 만들고, 그 외에는 모든 세션이 같은 결과를 공유
+    """
+    return _build_subsidy_index(table_version(conn, "ev_model_local_subsidy"), conn)
+
+class SubsidyMatrix:
+    """지역 × 모델 보조금 행렬 (국비/지방비/총 보조금, 없는 조합은 NaN)
+
+    모델 하나의 전국 지역 순위는 열 하나, 지역 하나의 모델 순위는 행 하나를 정렬하면 되므로
+    선택 상태마다 데이터를 다시 거르지 않고 행렬 연산 한 번으로 계산합니다.
+    """
+
+    def __init__(self, df):
+        df = df.drop_duplicates(subset=SUBSIDY_LEVELS)
+        region_codes, self.regions = pd.factorize(df["region_name"], sort=True)
+        model_cols = ["vehicle_type", "manufacturer", "model_name"]
+        self.models = df[model_cols].drop_duplicates().sort_values(model_cols).reset_index(drop=True)
+        model_codes = pd.MultiIndex.from_frame(self.models).get_indexer(pd.MultiIndex.from_frame(df[model_cols]))
+        self.model_labels = (
+            self.models["manufacturer"].astype(str) + " " + self.models["model_name"].astype(str)
+            + " (" + self.models["vehicle_type"].astype(str) + ")"
+        ).to_numpy()
+
+        shape = (len(self.regions), len(self.models))
+        self.values = {}
+        for col in ("gov_subsidy", "local_subsidy", "total_subsidy"):
+            matrix = np.full(shape, np.nan)
+            matrix[region_codes, model_codes] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            self.values[col] = matrix
+        self.region_pos = {region: i for i, region in enumerate(self.regions)}
+        self.model_pos = {label: i for i, label in enumerate(self.model_labels)}
+
+    def rank_regions(self, model_label, price=None):
+        """모델의 지역별 보조금을 총 보조금이 큰 순서로 반환합니다. price(만원)를 주면 실구매가도 계산합니다."""
+        m = self.model_pos[model_label]
+        total = self.values["total_subsidy"][:, m]
+        rows = np.flatnonzero(~np.isnan(total))
+        rows = rows[np.argsort(-total[rows], kind="stable")]
+        result = pd.DataFrame({
+            "순위": np.arange(1, len(rows) + 1),
+            "지역": self.regions[rows],
+            "국비": self.values["gov_subsidy"][rows, m],
+            "지방비": self.values["local_subsidy"][rows, m],
+            "총 보조금": total[rows],
+        })
+        if price:
+            result["실구매가"] = price - result["총 보조금"]
+        return result
+
+    def top_models(self, region, k=10, vehicle_type=None):
+        """지역에서 총 보조금이 가장 큰 모델 k개"""
+        total = self.values["total_subsidy"][self.region_pos[region]]
+        valid = ~np.isnan(total)
+        if vehicle_type:
+            valid &= (self.models["vehicle_type"] == vehicle_type).to_numpy()
+        cols = np.flatnonzero(valid)
+        cols = cols[np.argsort(-total[cols], kind="stable")][:k]
+        national = np.nanmean(self.values["total_subsidy"][:, cols], axis=0) if len(cols) else np.empty(0)
+        return pd.DataFrame({
+            "순위": np.arange(1, len(cols) + 1),
+            "제조사": self.models["manufacturer"].to_numpy()[cols],
+            "모델명": self.models["model_name"].to_numpy()[cols],
+            "차종": self.models["vehicle_type"].to_numpy()[cols],
+            "총 보조금": total[cols],
+            "전국 평균 대비": total[cols] - national,
+        })
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_subsidy_matrix(version, _conn):
+    return SubsidyMatrix(cached_read_sql(MODEL_SUBSIDY_QUERY, _conn, "ev_model_local_subsidy"))
+
+
+def get_subsidy_matrix(conn):
+    """
+    지역 × 모델 보조금 행렬을 반환
+    ev_model_local_subsidy 데이터 버전이 바뀔 때만 다시 만들고, 그 외에는 모든 세션이 같은 결과를 공유
+    """
+    return _build_subsidy_matrix(table_version(conn, "ev_model_local_subsidy"), conn)
 
 @st.cache_data(ttl=3600)
 def get_contact_info(_conn):
     query = "SELECT sido AS 시도, region_name AS 지역, department AS 담당부서, phone AS 연락처 FROM ev_local_contact"
-    return pd.read_sql(query, _conn)
-
-# FAQ 데이터를 가져오는 새로운 함수
-@st.cache_data(ttl=3600)
-def get_faq_data(_conn):
-    # tag, question, answer 컬럼만 사용하며 순서대로 정렬
-    query = "SELECT tag, question, answer FROM ev_faq ORDER BY page, faq_order"
-    return pd.read_sql(query, _conn)
+    return cached_read_sql(query, _conn, "ev_local_contact")
 
 def render_subsidy_page(conn):
     st.title("🚗 전기차 보조금 정보")
 
-    # FAQ 탭을 두 번째와 세 번째 사이에 추가
-    tab1, tab2, tab3, tab4 = st.tabs(["지역별 현황", "차종별 상세조회", "지자체 연락처", "자주 묻는 질문(FAQ)"])
+    # 지역별 현황 → 차종별 상세조회 → 전국 보조금 비교 → 지자체 연락처 → FAQ 순서
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["지역별 현황", "차종별 상세조회", "전국 보조금 비교", "지자체 연락처", "자주 묻는 질문(FAQ)"])
 
     with tab1:
         render_region_subsidy(conn)
     with tab2:
         render_model_subsidy(conn)
     with tab3:
-        render_contact(conn) # FAQ 렌더링 함수 호출
+        render_subsidy_compare(conn)
     with tab4:
+        render_contact(conn)
+    with tab5:
         render_faq_section(conn)
 
 def render_region_subsidy(conn):
@@ -45,29 +173,29 @@ def render_region_subsidy(conn):
     st.dataframe(df, width="stretch", hide_index=True)
 
 def render_model_subsidy(conn):
-    df_all = get_model_options(conn)
+    index = get_subsidy_index(conn)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        region = st.selectbox("지역 선택", ["지역을 선택해주세요"] + sorted(df_all["region_name"].unique()))
+        region = st.selectbox("지역 선택", ["지역을 선택해주세요"] + index.options())
     
-    df_s1 = df_all[df_all["region_name"] == region] if region != "지역을 선택해주세요" else pd.DataFrame()
+    s1 = region != "지역을 선택해주세요"
     
     with col2:
-        v_type = st.selectbox("차종 선택", ["차종을 선택해주세요"] + sorted(df_s1["vehicle_type"].unique()) if not df_s1.empty else ["지역을 먼저 선택해주세요"])
+        v_type = st.selectbox("차종 선택", ["차종을 선택해주세요"] + index.options(region) if s1 else ["지역을 먼저 선택해주세요"])
 
-    df_s2 = df_s1[df_s1["vehicle_type"] == v_type] if v_type not in ["차종을 선택해주세요", "지역을 먼저 선택해주세요"] else pd.DataFrame()
+    s2 = s1 and v_type != "차종을 선택해주세요"
 
     with col3:
-        m_fact = st.selectbox("제조사 선택", ["제조사를 선택해주세요"] + sorted(df_s2["manufacturer"].unique()) if not df_s2.empty else ["차종을 먼저 선택해주세요"])
+        m_fact = st.selectbox("제조사 선택", ["제조사를 선택해주세요"] + index.options(region, v_type) if s2 else ["차종을 먼저 선택해주세요"])
 
-    df_s3 = df_s2[df_s2["manufacturer"] == m_fact] if m_fact not in ["제조사를 선택해주세요", "차종을 먼저 선택해주세요"] else pd.DataFrame()
+    s3 = s2 and m_fact != "제조사를 선택해주세요"
 
     with col4:
-        model = st.selectbox("모델 선택", ["모델을 선택해주세요"] + sorted(df_s3["model_name"].unique()) if not df_s3.empty else ["제조사를 먼저 선택해주세요"])
+        model = st.selectbox("모델 선택", ["모델을 선택해주세요"] + index.options(region, v_type, m_fact) if s3 else ["제조사를 먼저 선택해주세요"])
 
-    if model not in ["모델을 선택해주세요", "제조사를 먼저 선택해주세요"]:
-        res = df_s3[df_s3["model_name"] == model].iloc[0]
+    res = index.lookup(region, v_type, m_fact, model) if s3 else None
+    if res is not None:
         st.markdown("---")
         c1, c2, c3 = st.columns(3)
         c1.metric("국비", f"{res['gov_subsidy']:,} 만원")
@@ -83,6 +211,49 @@ def render_model_subsidy(conn):
         st.info("상단 항목을 모두 선택하시면 상세 보조금 정보가 표시됩니다.")
 
 
+def render_subsidy_compare(conn):
+    matrix = get_subsidy_matrix(conn)
+    if len(matrix.regions) == 0:
+        st.warning("보조금 데이터가 없습니다.")
+        return
+
+    mode = st.radio("비교 방식", ["모델별 지역 순위", "우리 지역 보조금 TOP 10 모델"], horizontal=True, key="compare_mode")
+    money = st.column_config.NumberColumn(format="%d 만원")
+
+    if mode == "모델별 지역 순위":
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            model = st.selectbox("모델 선택", sorted(matrix.model_labels), key="compare_model")
+        with c2:
+            price = st.number_input("차량 가격 (만원, 선택)", min_value=0, value=0, step=100, key="compare_price")
+        ranking = matrix.rank_regions(model, price or None)
+        if ranking.empty:
+            st.info("선택한 모델의 지역별 보조금 정보가 없습니다.")
+            return
+        best = ranking.iloc[0]
+        st.metric("보조금이 가장 많은 지역", best["지역"], f"총 {best['총 보조금']:,.0f} 만원", delta_color="off")
+        st.dataframe(
+            ranking, width="stretch", hide_index=True,
+            column_config={c: money for c in ["국비", "지방비", "총 보조금", "실구매가"]},
+        )
+    else:
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            region = st.selectbox("지역 선택", list(matrix.regions), key="compare_region")
+        with c2:
+            v_type = st.selectbox("차종", ["전체"] + sorted(matrix.models["vehicle_type"].unique()), key="compare_vtype")
+        top = matrix.top_models(region, 10, None if v_type == "전체" else v_type)
+        if top.empty:
+            st.info("선택한 조건의 모델별 보조금 정보가 없습니다.")
+            return
+        st.dataframe(
+            top, width="stretch", hide_index=True,
+            column_config={
+                "총 보조금": money,
+                "전국 평균 대비": st.column_config.NumberColumn(format="%+.0f 만원"),
+            },
+        )
+
 
 def render_contact(conn):
     df_contact = get_contact_info(conn)
@@ -98,18 +269,37 @@ def render_contact(conn):
     # --- FAQ 섹션 추가 ---
 def render_faq_section(conn):
     st.subheader("💡 자주 묻는 질문")
-    df_faq = get_faq_data(conn)
+    # 브랜드 FAQ와 함께 한 번에 읽어 둔 보조금 FAQ (page, faq_order 순)
+    try:
+        index = get_faq_index(conn)
+    except Exception as e:
+        st.error(f"FAQ 데이터를 불러오는 중 오류가 발생했습니다: {e}")
+        return
+    df_faq = index.documents("보조금").rename(columns={"category": "tag"})
     
     # 상단 태그 필터 (사용자가 관심 있는 카테고리만 골라 볼 수 있게 함)
     tags = ["전체"] + sorted(df_faq["tag"].unique().tolist())
     selected_tag = st.selectbox("카테고리를 선택해주세요", tags)
     
-    filtered_faq = df_faq if selected_tag == "전체" else df_faq[df_faq["tag"] == selected_tag]
+    keyword = st.text_input("FAQ 검색", placeholder="예: 신청 기간, 중복 지원, 배터리", key="subsidy_faq_search")
+
+    if keyword:
+        # 질문/답변 전체에서 관련도 순으로 검색
+        hits = index.search(keyword, k=30, sources=["보조금"])
+        filtered_faq = hits.rename(columns={"category": "tag"})[["tag", "question", "answer"]]
+        st.caption(f"'{keyword}' 관련 질문 {len(filtered_faq)}건 (관련도 순)")
+    else:
+        filtered_faq = df_faq
+    if selected_tag != "전체":
+        filtered_faq = filtered_faq[filtered_faq["tag"] == selected_tag]
     
     st.write("") # 간격 조절
-    
-    for _, row in filtered_faq.iterrows():
+
+    # 현재 페이지의 행만 (태그, 질문, 답변) 튜플로 꺼내 출력
+    start, end = paginate(len(filtered_faq), "subsidy_faq", reset_on=(keyword, selected_tag))
+    page_faq = filtered_faq.iloc[start:end]
+    for tag, question, answer in zip(page_faq["tag"], page_faq["question"], page_faq["answer"]):
         # 질문과 태그를 조합하여 제목 생성
-        with st.expander(f"[{row['tag']}] {row['question']}"):
+        with st.expander(f"[{tag}] {question}"):
             # 답변 출력 (내부 줄바꿈 보존)
-            st.markdown(row['answer'])
\ No newline at end of file
+            st.markdown(answer)
@@ -0,0 +1,124 @@
+"""충전소 주소를 정규화된 키로 바꿔 서로 다른 데이터끼리 결합하는 모듈.
+
+한전/환경공단 데이터는 같은 장소라도 주소 표기가 조금씩 다릅니다.
+(예: '강원도' vs '강원특별자치도', '동278' vs '동 278', '928-6번지', 뒤에 붙은 '(역삼동)' 같은 참고 항목)
+주소 문자열 그대로 비교하는 대신 시도명을 표준 이름으로 바꾸고, 공백/숫자 표기를 통일한 키로 비교합니다.
+
+정규화 결과는 원본 문자열별로 기억해 두므로, 한쪽 파일만 바뀌었을 때는 새로 나온 주소만 정규화합니다.
+기억해 두는 주소 수는 MAX_MEMO개로 제한하고, 넘으면 가장 오래 쓰지 않은 주소부터 지웁니다.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 시도 표기 → 표준 이름
+SIDO_ALIASES = {
+    '서울': '서울특별시', '서울시': '서울특별시', '서울특별시': '서울특별시',
+    '부산': '부산광역시', '부산시': '부산광역시', '부산광역시': '부산광역시',
+    '대구': '대구광역시', '대구시': '대구광역시', '대구광역시': '대구광역시',
+    '인천': '인천광역시', '인천시': '인천광역시', '인천광역시': '인천광역시',
+    '광주': '광주광역시', '광주시': '광주광역시', '광주광역시': '광주광역시',
+    '대전': '대전광역시', '대전시': '대전광역시', '대전광역시': '대전광역시',
+    '울산': '울산광역시', '울산시': '울산광역시', '울산광역시': '울산광역시',
+    '세종': '세종특별자치시', '세종시': '세종특별자치시', '세종특별자치시': '세종특별자치시',
+    '경기': '경기도', '경기도': '경기도',
+    '강원': '강원특별자치도', '강원도': '강원특별자치도', '강원특별자치도': '강원특별자치도',
+    '충북': '충청북도', '충청북도': '충청북도',
+    '충남': '충청남도', '충청남도': '충청남도',
+    '전북': '전북특별자치도', '전라북도': '전북특별자치도', '전북특별자치도': '전북특별자치도',
+    '전남': '전라남도', '전라남도': '전라남도',
+    '경북': '경상북도', '경상북도': '경상북도',
+    '경남': '경상남도', '경상남도': '경상남도',
+    '제주': '제주특별자치도', '제주도': '제주특별자치도', '제주특별자치도': '제주특별자치도',
+}
+
+# 정규화 결과를 기억해 둘 최대 주소 수 (한전+환경공단 파일 한 벌의 고유 주소보다 넉넉하게)
+MAX_MEMO = 200_000
+
+
+def normalize_addresses(addresses):
+    """주소 배열을 비교용 키 배열로 바꿉니다. (벡터 연산)
+
+    키는 '표준 시도명 나머지주소' 형태이며, 나머지 주소는 공백을 모두 없애고
+    숫자 앞의 0, '번지', 괄호 안 참고 항목, 쉼표 뒤의 층/호수를 제거한 것입니다.
+    """
+    s = pd.Series(addresses, dtype=object).fillna('').astype(str)
+    # 전각 숫자/기호를 반각으로
+    s = s.str.normalize('NFKC')
+    s = s.str.split(',', n=1).str[0]
+    s = s.str.replace(r'\([^)]*\)', ' ', regex=True)
+    s = s.str.replace(r'[‐‑‒–—―~]', '-', regex=True)
+    s = s.str.replace('번지', '', regex=False)
+    s = s.str.strip()
+
+    parts = s.str.extract(r'^(\S*)\s*(.*)$')
+    sido = parts[0].map(SIDO_ALIASES).fillna(parts[0])
+    rest = (
+        parts[1]
+        .str.replace(r'\s+', '', regex=True)
+        .str.replace(r'(?<!\d)0+(?=\d)', '', regex=True)
+    )
+    return (sido + ' ' + rest).str.strip().to_numpy(dtype=object)
+
+
+class AddressNormalizer:
+    """원본 주소 → 키 변환 결과를 최근 max_size개까지 기억해 두는 정규화기. 여러 세션이 공유해도 안전합니다."""
+
+    def __init__(self, max_size=MAX_MEMO):
+        self.max_size = max_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._memo)
+
+    def keys(self, addresses):
+        """주소 배열의 키 배열. 처음 보는 주소만 정규화합니다."""
+        raw = pd.Series(addresses, dtype=object).fillna('').astype(str)
+        uniques = pd.unique(raw)
+        with self._lock:
+            found = {a: self._memo[a] for a in uniques if a in self._memo}
+            for a in found:
+                self._memo.move_to_end(a)
+        missing = [a for a in uniques if a not in found]
+        if missing:
+            new = dict(zip(missing, normalize_addresses(missing)))
+            found.update(new)
+            with self._lock:
+                self._memo.update(new)
+                # 오래 쓰지 않은 주소부터 지움
+                while len(self._memo) > self.max_size:
+                    self._memo.popitem(last=False)
+        return raw.map(found).to_numpy(dtype=object)
+
+
+# 프로세스 전체에서 공유하는 기본 정규화기
+default_normalizer = AddressNormalizer()
+
+
+class AddressIndex:
+    """주소 키 → 행 위치 해시 인덱스. 한 번 만들어 두고 여러 번 조회합니다.
+
+    같은 키가 여러 행에 있으면 첫 행을 사용합니다. (기존 drop_duplicates 기준과 같음)
+    """
+
+    def __init__(self, addresses, normalizer=None):
+        self.normalizer = normalizer or default_normalizer
+        keys = pd.Index(self.normalizer.keys(addresses))
+        first = ~keys.duplicated()
+        # 빈 주소는 아무것과도 결합하지 않음
+        first &= keys != ''
+        self.keys = keys[first]
+        self.rows = np.flatnonzero(first)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, addresses):
+        """각 주소와 키가 같은 행의 위치 배열. 없으면 -1입니다."""
+        pos = self.keys.get_indexer(self.normalizer.keys(addresses))
+        if len(self.rows) == 0:
+            return pos
+        return np.where(pos >= 0, self.rows[pos], -1)
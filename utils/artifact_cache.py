@@ -0,0 +1,135 @@
+"""입력 파일 해시로 구분해 디스크에 저장하는 가공 결과(아티팩트) 캐시.
+
+st.cache_resource로 만든 결과는 프로세스가 끝나면 사라지므로, 배포 후 첫 사용자는 전체 가공을 기다려야 합니다.
+가공 결과 DataFrame을 (입력 파일 해시 + 생성 코드 버전) 이름의 Parquet 파일로 저장해 두고,
+다음 실행부터는 파일을 바로 읽습니다.
+
+입력이 바뀌었는데 이전 버전 아티팩트가 있으면 그것을 먼저 보여주고, 새 아티팩트는 백그라운드 스레드에서 만듭니다.
+이전 아티팩트를 받아 간 세션이 아직 읽고 있을 수 있으므로, 최근 KEEP_ARTIFACTS개는 지우지 않고 남겨 둡니다.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.csv_cache import file_sha1
+from utils.db import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = os.environ.get('ARTIFACT_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'artifacts'))
+# 같은 생성 코드 버전에서 남겨 둘 최근 아티팩트 수 (새 파일 + 직전에 내준 파일)
+KEEP_ARTIFACTS = 2
+
+
+def input_key(paths, version):
+    """입력 파일 내용과 생성 코드 버전으로 아티팩트 키를 만듭니다."""
+    h = hashlib.sha1(f"v{version}".encode())
+    for path in paths:
+        h.update(os.path.basename(path).encode())
+        h.update(file_sha1(path).encode())
+    return h.hexdigest()[:20]
+
+
+class ArtifactCache:
+    """name별 DataFrame 아티팩트 저장소. version은 생성 코드(결과 형식)가 바뀔 때 올립니다."""
+
+    def __init__(self, name, version, cache_dir=ARTIFACT_DIR):
+        self.name = name
+        self.version = version
+        self.cache_dir = cache_dir
+        self._building = set()
+        # 키별 잠금 (이전 아티팩트가 없을 때 같은 키를 여러 세션이 동시에 만들지 않도록 함)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{self.name}-v{self.version}-{key}.parquet")
+
+    def latest(self):
+        """같은 생성 코드 버전의 아티팩트 중 가장 최근 파일 경로 (없으면 None)"""
+        paths = glob.glob(os.path.join(self.cache_dir, f"{self.name}-v{self.version}-*.parquet"))
+        return max(paths, key=os.path.getmtime) if paths else None
+
+    def read(self, path):
+        """아티팩트를 memory map으로 읽습니다. 저장할 때의 df.attrs도 복원합니다."""
+        table = pq.read_table(path, memory_map=True)
+        df = table.to_pandas()
+        df.attrs.update(json.loads((table.schema.metadata or {}).get(b'attrs', b'{}')))
+        return df
+
+    def write(self, key, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'attrs': json.dumps(df.attrs, ensure_ascii=False, default=str).encode(),
+        })
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        # 스레드/프로세스마다 다른 임시 파일에 쓴 뒤 교체
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=f"{self.name}-", suffix='.tmp', delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._prune()
+        return path
+
+    def _prune(self):
+        """다른 생성 코드 버전의 아티팩트와, 같은 버전에서 최근 KEEP_ARTIFACTS개보다 오래된 아티팩트를 지웁니다."""
+        current = glob.glob(os.path.join(self.cache_dir, f"{self.name}-v{self.version}-*.parquet"))
+        current.sort(key=os.path.getmtime, reverse=True)
+        keep = set(current[:KEEP_ARTIFACTS])
+        for old in glob.glob(os.path.join(self.cache_dir, f"{self.name}-v*.parquet")):
+            if old not in keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _build(self, key, build):
+        try:
+            self.write(key, build())
+        except Exception:
+            logger.exception("아티팩트 생성 실패 (%s, %s)", self.name, key)
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def resolve(self, key, build):
+        """key의 아티팩트 경로와 최신 여부 (path, fresh)를 반환합니다.
+
+        key의 파일이 없으면 이전 아티팩트를 반환하면서 build()를 백그라운드에서 실행하고,
+        이전 아티팩트도 없으면 지금 build()를 실행해 저장합니다.
+        """
+        path = self.path(key)
+        if os.path.exists(path):
+            return path, True
+
+        stale = self.latest()
+        if stale is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                # 기다리는 동안 다른 세션이 만들었으면 그 파일을 사용
+                if not os.path.exists(path):
+                    self.write(key, build())
+            return path, True
+
+        with self._lock:
+            if key not in self._building:
+                self._building.add(key)
+                threading.Thread(target=self._build, args=(key, build), daemon=True).start()
+        return stale, False
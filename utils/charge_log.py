@@ -0,0 +1,274 @@
+"""충전 세션 로그를 조금씩 읽어 고정 크기 시간대별 히스토그램에 누적하는 모듈.
+
+혼잡도 페이지는 ev_charge_load 전체를 다시 읽는 대신, 계속 늘어나는 세션 로그(CSV 파일 또는 DB 테이블)에서
+마지막으로 읽은 위치 이후의 행만 청크 단위로 읽어 NumPy 배열에 더합니다.
+배열 크기는 (보관 일수 × 충전방식 × 24시간)으로 고정되어 있어, 로그가 수억 행으로 늘어나도 메모리는 일정합니다.
+
+로그 형식 (CSV는 첫 줄에 헤더 필요):
+    started_at   충전 시작 시각 (예: 2026-01-15 13:42:00)
+    charge_type  충전 방식 (예: 급속, 완속)
+    kwh          충전량
+    station_id   충전소 ID (선택)
+"""
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.db import read_sql
+
+# 로그 파일 경로 (설정하지 않으면 혼잡도 페이지의 로그 섹션이 표시되지 않음)
+CHARGE_LOG_PATH = os.environ.get('CHARGE_LOG_PATH')
+
+LOG_COLUMNS = ['started_at', 'charge_type', 'kwh', 'station_id']
+
+# 최근 며칠치를 보관할지
+WINDOW_DAYS = 28
+# 구분해서 집계할 최대 충전방식 수 (넘치는 방식은 '기타'로 합침)
+MAX_CHARGE_TYPES = 8
+OTHER_CHARGE_TYPE = '기타'
+# 충전소별 집계에 사용할 해시 버킷 수 (0이면 충전소별 집계 안 함)
+STATION_BUCKETS = 4096
+# 한 번에 읽을 최대 바이트 수 (파일) / 행 수 (테이블)
+CHUNK_BYTES = 32 * 1024 * 1024
+CHUNK_ROWS = 200_000
+
+
+class RollingHourlyHistogram:
+    """최근 window_days일의 (충전방식, 시간대) 세션 수/충전량 합계를 보관하는 링 버퍼.
+
+    날짜마다 링 버퍼의 한 칸(slot)을 쓰고, 보관 기간이 지난 칸은 새 날짜가 들어올 때 비웁니다.
+    """
+
+    def __init__(self, window_days=WINDOW_DAYS, max_charge_types=MAX_CHARGE_TYPES,
+                 station_buckets=STATION_BUCKETS):
+        self.window_days = window_days
+        self.max_charge_types = max_charge_types
+        self.station_buckets = station_buckets
+
+        self.sessions = np.zeros((window_days, max_charge_types, 24), dtype=np.int64)
+        self.kwh = np.zeros((window_days, max_charge_types, 24), dtype=np.float64)
+        self.station_sessions = (
+            np.zeros((window_days, station_buckets, 24), dtype=np.int32) if station_buckets else None
+        )
+        # 각 칸이 담고 있는 날짜 (1970-01-01부터 지난 일수, -1은 빈 칸)
+        self.slot_day = np.full(window_days, -1, dtype=np.int64)
+        self.latest_day = -1
+        # 실제로 세션이 들어온 가장 이른 날짜 (-1은 아직 없음). 하루 평균의 분모 계산에 사용
+        self.first_day = -1
+        self.charge_types = []
+        self._type_codes = {}
+
+    def _codes_for(self, charge_types):
+        codes = np.empty(len(charge_types), dtype=np.intp)
+        uniques, inverse = np.unique(np.asarray(charge_types, dtype=str), return_inverse=True)
+        for i, name in enumerate(uniques):
+            code = self._type_codes.get(name)
+            if code is None:
+                if len(self.charge_types) < self.max_charge_types - 1:
+                    code = len(self.charge_types)
+                    self.charge_types.append(name)
+                else:
+                    # 마지막 칸은 '기타'로 예약
+                    if OTHER_CHARGE_TYPE not in self._type_codes:
+                        self.charge_types.append(OTHER_CHARGE_TYPE)
+                        self._type_codes[OTHER_CHARGE_TYPE] = self.max_charge_types - 1
+                    code = self._type_codes[OTHER_CHARGE_TYPE]
+                self._type_codes[name] = code
+            codes[inverse == i] = code
+        return codes
+
+    def _advance(self, day):
+        """최신 날짜를 day로 옮기고, 보관 기간에서 벗어난 칸을 비웁니다."""
+        if day <= self.latest_day:
+            return
+        self.latest_day = day
+        slots = np.arange(self.window_days)
+        # 각 칸에 들어가야 할 날짜: latest - window < d <= latest 이고 d % window == slot
+        expected = day - ((day - slots) % self.window_days)
+        stale = self.slot_day != expected
+        self.sessions[stale] = 0
+        self.kwh[stale] = 0
+        if self.station_sessions is not None:
+            self.station_sessions[stale] = 0
+        self.slot_day[stale] = expected[stale]
+
+    def station_bucket(self, station_ids):
+        ids = np.asarray(station_ids, dtype=object).astype(str)
+        return (pd.util.hash_array(ids) % self.station_buckets).astype(np.intp)
+
+    def add(self, started_at, charge_types, kwh, station_ids=None):
+        """세션 배열을 한 번에 누적합니다. 보관 기간보다 오래된 세션은 무시합니다."""
+        started_at = pd.to_datetime(pd.Series(started_at), errors='coerce').to_numpy()
+        valid = ~np.isnat(started_at)
+        if not valid.any():
+            return 0
+
+        hours_since_epoch = started_at.astype('datetime64[h]').astype(np.int64)
+        day = hours_since_epoch // 24
+        hour = (hours_since_epoch % 24).astype(np.intp)
+
+        self._advance(int(day[valid].max()))
+        keep = valid & (day > self.latest_day - self.window_days)
+        if not keep.all():
+            day, hour = day[keep], hour[keep]
+            charge_types = np.asarray(charge_types)[keep]
+            kwh = np.asarray(kwh)[keep]
+            if station_ids is not None:
+                station_ids = np.asarray(station_ids, dtype=object)[keep]
+
+        if len(day):
+            earliest = int(day.min())
+            self.first_day = earliest if self.first_day < 0 else min(self.first_day, earliest)
+
+        slot = (day % self.window_days).astype(np.intp)
+        codes = self._codes_for(charge_types)
+        np.add.at(self.sessions, (slot, codes, hour), 1)
+        np.add.at(self.kwh, (slot, codes, hour), np.nan_to_num(np.asarray(kwh, dtype=float)))
+        if self.station_sessions is not None and station_ids is not None:
+            np.add.at(self.station_sessions, (slot, self.station_bucket(station_ids), hour), 1)
+        return len(day)
+
+    def hourly_profile(self, charge_type):
+        """보관 기간 동안의 시간대별 하루 평균 세션 수와 세션당 평균 충전량"""
+        code = self._type_codes.get(charge_type)
+        if code is None:
+            return pd.DataFrame(columns=["세션 수", "세션당 kWh"])
+        days = max(self.days_covered, 1)
+        sessions = self.sessions[:, code, :].sum(axis=0)
+        kwh = self.kwh[:, code, :].sum(axis=0)
+        return pd.DataFrame({
+            "세션 수": sessions / days,
+            "세션당 kWh": np.divide(kwh, sessions, out=np.zeros(24), where=sessions > 0),
+        }, index=pd.RangeIndex(24, name="hour"))
+
+    def station_hourly_sessions(self, station_id):
+        """충전소의 시간대별 세션 수 (해시 버킷 단위라 드물게 다른 충전소와 합산될 수 있음)"""
+        if self.station_sessions is None:
+            return None
+        bucket = self.station_bucket([station_id])[0]
+        return self.station_sessions[:, bucket, :].sum(axis=0)
+
+    @property
+    def days_covered(self):
+        """첫 세션 날짜부터 최신 날짜까지의 일수 (보관 기간 이내). 세션이 없던 날도 포함합니다."""
+        if self.first_day < 0:
+            return 0
+        return min(self.latest_day - self.first_day + 1, self.window_days)
+
+    @property
+    def total_sessions(self):
+        return int(self.sessions.sum())
+
+
+class CsvLogSource:
+    """계속 뒤에 추가되는 CSV 로그 파일을 마지막으로 읽은 위치부터 읽습니다."""
+
+    def __init__(self, path, chunk_bytes=CHUNK_BYTES):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.offset = 0
+        self.header = None
+
+    def reset(self):
+        self.offset = 0
+        self.header = None
+
+    def truncated(self):
+        return os.path.getsize(self.path) < self.offset
+
+    def read_chunks(self):
+        with open(self.path, 'rb') as f:
+            if self.header is None:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    return
+                self.header = line.decode('utf-8-sig').strip().split(',')
+                self.offset = f.tell()
+
+            f.seek(self.offset)
+            while True:
+                block = f.read(self.chunk_bytes)
+                if not block:
+                    return
+                # 아직 쓰는 중인 마지막 줄은 다음에 읽음
+                end = block.rfind(b'\n')
+                if end < 0:
+                    if len(block) < self.chunk_bytes:
+                        return
+                    raise ValueError(f"로그 한 줄이 {self.chunk_bytes} 바이트보다 깁니다: {self.path}")
+                block = block[:end + 1]
+                f.seek(self.offset + len(block))
+                self.offset += len(block)
+                yield pd.read_csv(io.BytesIO(block), header=None, names=self.header)
+
+
+class TableLogSource:
+    """증가하는 ID 컬럼을 가진 DB 테이블에서 마지막으로 읽은 ID 이후의 행을 읽습니다."""
+
+    def __init__(self, pool, table, id_column='id', chunk_rows=CHUNK_ROWS):
+        self.pool = pool
+        self.table = table
+        self.id_column = id_column
+        self.chunk_rows = chunk_rows
+        self.last_id = None
+
+    def reset(self):
+        self.last_id = None
+
+    def truncated(self):
+        return False
+
+    def read_chunks(self):
+        ph = "%s" if self.pool.backend == "mysql" else "?"
+        columns = ", ".join([self.id_column] + LOG_COLUMNS)
+        while True:
+            where = f"WHERE {self.id_column} > {ph} " if self.last_id is not None else ""
+            params = (self.last_id,) if self.last_id is not None else None
+            df = read_sql(
+                f"SELECT {columns} FROM {self.table} {where}ORDER BY {self.id_column} LIMIT {self.chunk_rows}",
+                self.pool, params=params,
+            )
+            if df.empty:
+                return
+            self.last_id = df[self.id_column].iloc[-1]
+            yield df
+            if len(df) < self.chunk_rows:
+                return
+
+
+class ChargeLogIngestor:
+    """로그 소스에서 새 행만 읽어 히스토그램에 누적합니다. 여러 세션이 공유해도 안전합니다."""
+
+    def __init__(self, source, histogram=None):
+        self.source = source
+        self.histogram = histogram or RollingHourlyHistogram()
+        self.rows_ingested = 0
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """새로 추가된 행을 모두 반영하고, 이번에 반영한 행 수를 반환합니다."""
+        with self._lock:
+            if self.source.truncated():
+                # 로그가 교체(로테이션)되었으면 처음부터 다시 읽음
+                self.source.reset()
+                self.histogram = RollingHourlyHistogram(
+                    self.histogram.window_days,
+                    self.histogram.max_charge_types,
+                    self.histogram.station_buckets,
+                )
+                self.rows_ingested = 0
+
+            added = 0
+            for chunk in self.source.read_chunks():
+                chunk = chunk.dropna(subset=['started_at', 'charge_type'])
+                added += self.histogram.add(
+                    chunk['started_at'],
+                    chunk['charge_type'],
+                    chunk['kwh'],
+                    chunk['station_id'] if 'station_id' in chunk else None,
+                )
+            self.rows_ingested += added
+            return added
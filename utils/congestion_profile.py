@@ -0,0 +1,254 @@
+"""ev_charge_load의 (충전방식, 요일, 시간대)별 합계/건수를 DB 안에 유지하는 집계 테이블.
+
+원본 테이블 전체를 내려받아 pandas로 평균을 내는 대신, DB에 작은 집계 테이블을 두고
+마지막으로 반영한 날짜 이후의 데이터만 더해 갱신합니다.
+페이지는 충전방식 수 × 7 × 24행만 읽으므로 적재된 기간이 길어져도 읽는 양이 늘지 않습니다.
+
+날짜 단위로 증분을 반영하므로, 이미 반영한 날짜에 나중에 행이 추가되면 그 행은 빠집니다.
+원본 데이터를 다시 적재했다면 rebuild_profile()로 처음부터 다시 집계해주세요.
+
+집계 테이블은 페이지에서 만들지 않고 설정 단계에서 한 번 만듭니다.
+    python -m utils.congestion_profile           # DB_BACKEND의 DB에 집계 테이블 생성 후 전체 집계
+sqlite 스냅샷(python -m utils.snapshot)은 복사할 때 집계 테이블도 함께 만듭니다.
+테이블이 없으면 페이지는 같은 집계를 DB에서 한 번 계산해 사용합니다.
+"""
+import argparse
+import logging
+import threading
+
+import pandas as pd
+
+from utils.db import ConnectionPool, read_sql
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TABLE = "ev_charge_load"
+PROFILE_TABLE = "ev_charge_load_profile"
+STATE_TABLE = "ev_charge_load_profile_state"
+# (충전방식, 시간대)만 집계하던 이전 테이블. 지금은 읽지 않으므로 설정할 때 지움
+LEGACY_TABLES = ["ev_charge_load_hourly", "ev_charge_load_hourly_state"]
+
+# 월요일=0 ... 일요일=6 (파이썬 datetime.weekday()와 같은 기준)
+_WEEKDAY = {
+    "mysql": "WEEKDAY(date)",
+    "sqlite": "(CAST(strftime('%w', date) AS INTEGER) + 6) % 7",
+}
+
+_DDL = {
+    "mysql": [
+        f"""CREATE TABLE IF NOT EXISTS {PROFILE_TABLE} (
+            charge_type VARCHAR(20) NOT NULL,
+            weekday TINYINT NOT NULL,
+            hour TINYINT NOT NULL,
+            kwh_sum DOUBLE NOT NULL,
+            kwh_count BIGINT NOT NULL,
+            PRIMARY KEY (charge_type, weekday, hour)
+        )""",
+        f"""CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            id TINYINT PRIMARY KEY,
+            last_date DATE NULL
+        )""",
+        f"INSERT IGNORE INTO {STATE_TABLE} (id, last_date) VALUES (1, NULL)",
+    ],
+    "sqlite": [
+        f"""CREATE TABLE IF NOT EXISTS {PROFILE_TABLE} (
+            charge_type TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            kwh_sum REAL NOT NULL,
+            kwh_count INTEGER NOT NULL,
+            PRIMARY KEY (charge_type, weekday, hour)
+        )""",
+        f"""CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            id INTEGER PRIMARY KEY,
+            last_date TEXT
+        )""",
+        f"INSERT OR IGNORE INTO {STATE_TABLE} (id, last_date) VALUES (1, NULL)",
+    ],
+}
+
+# 새 날짜 구간(start < date <= end)의 합계/건수를 집계 테이블에 더하는 쿼리
+_UPSERT = {
+    "mysql": f"""
+        INSERT INTO {PROFILE_TABLE} (charge_type, weekday, hour, kwh_sum, kwh_count)
+        SELECT charge_type, {_WEEKDAY["mysql"]}, hour, SUM(kwh), COUNT(kwh)
+        FROM {SOURCE_TABLE}
+        WHERE date > %s AND date <= %s AND kwh IS NOT NULL
+        GROUP BY charge_type, {_WEEKDAY["mysql"]}, hour
+        ON DUPLICATE KEY UPDATE
+            kwh_sum = kwh_sum + VALUES(kwh_sum),
+            kwh_count = kwh_count + VALUES(kwh_count)
+    """,
+    "sqlite": f"""
+        INSERT INTO {PROFILE_TABLE} (charge_type, weekday, hour, kwh_sum, kwh_count)
+        SELECT charge_type, {_WEEKDAY["sqlite"]}, hour, SUM(kwh), COUNT(kwh)
+        FROM {SOURCE_TABLE}
+        WHERE date > ? AND date <= ? AND kwh IS NOT NULL
+        GROUP BY charge_type, {_WEEKDAY["sqlite"]}, hour
+        ON CONFLICT (charge_type, weekday, hour) DO UPDATE SET
+            kwh_sum = kwh_sum + excluded.kwh_sum,
+            kwh_count = kwh_count + excluded.kwh_count
+    """,
+}
+
+# 집계 테이블이 없을 때(설정 전, 권한 부족 등) 사용하는 일회성 집계 쿼리
+_AGGREGATE = {
+    backend: f"""
+        SELECT charge_type, {weekday} AS weekday, hour, SUM(kwh) AS kwh_sum, COUNT(kwh) AS kwh_count
+        FROM {SOURCE_TABLE}
+        WHERE kwh IS NOT NULL
+        GROUP BY charge_type, {weekday}, hour
+    """
+    for backend, weekday in _WEEKDAY.items()
+}
+
+# 마지막 날짜로부터 지난 주 수 (예측의 주별 가중치 계산용)
+_WEEK_AGE = {
+    "mysql": "FLOOR(DATEDIFF(max_date, date) / 7)",
+    "sqlite": "CAST((julianday(max_date) - julianday(date)) / 7 AS INTEGER)",
+}
+# 마지막 날짜로부터 days일 이내만 남기는 조건
+_RECENT = {
+    "mysql": "date > DATE_SUB(max_date, INTERVAL %s DAY)",
+    "sqlite": "date > date(max_date, '-' || ? || ' days')",
+}
+
+# 단기 예측용 (충전방식, 요일, 시간대, 지난 주 수)별 합계/제곱합/건수
+_WEEKLY_AGGREGATE = {
+    backend: f"""
+        SELECT charge_type, {weekday} AS weekday, hour, {_WEEK_AGE[backend]} AS age_weeks,
+            SUM(kwh) AS kwh_sum, SUM(kwh * kwh) AS kwh_sq_sum, COUNT(kwh) AS kwh_count
+        FROM {SOURCE_TABLE},
+            (SELECT MAX(date) AS max_date FROM {SOURCE_TABLE} WHERE kwh IS NOT NULL) AS latest
+        WHERE kwh IS NOT NULL AND {_RECENT[backend]}
+        GROUP BY charge_type, {weekday}, hour, {_WEEK_AGE[backend]}
+    """
+    for backend, weekday in _WEEKDAY.items()
+}
+
+# 한 프로세스 안에서 여러 세션이 동시에 갱신해 중복 합산되는 것을 막음
+_refresh_lock = threading.Lock()
+
+# 날짜 비교용 최소값 (처음 집계할 때 사용)
+_MIN_DATE = "0001-01-01"
+
+
+def _placeholder(pool):
+    return "%s" if pool.backend == "mysql" else "?"
+
+
+def _begin(pool, conn, cursor):
+    if pool.backend == "mysql":
+        conn.begin()
+    else:
+        # 다른 프로세스의 쓰기를 막기 위해 바로 쓰기 잠금을 잡음
+        cursor.execute("BEGIN IMMEDIATE")
+
+
+def setup_profile(conn, backend, reset=False):
+    """DB-API 연결 conn에 집계 테이블을 만듭니다. reset이면 비우고 처음부터 다시 집계하도록 표시합니다.
+
+    이전 형식의 집계 테이블(LEGACY_TABLES)이 남아 있으면 지웁니다.
+    설정 도구(이 모듈의 main, utils.snapshot)에서만 호출합니다.
+    """
+    cursor = conn.cursor()
+    try:
+        for table in LEGACY_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for ddl in _DDL[backend]:
+            cursor.execute(ddl)
+        if reset:
+            cursor.execute(f"DELETE FROM {PROFILE_TABLE}")
+            cursor.execute(f"UPDATE {STATE_TABLE} SET last_date = NULL WHERE id = 1")
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def refresh_profile(pool, rebuild=False):
+    """마지막 반영 날짜 이후의 데이터만 집계 테이블에 더합니다. 반영한 마지막 날짜를 반환합니다.
+
+    집계 테이블이 없으면 예외가 발생합니다. (setup_profile로 먼저 만들어야 함)
+    """
+    ph = _placeholder(pool)
+    with _refresh_lock, pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            _begin(pool, conn, cursor)
+            lock_clause = " FOR UPDATE" if pool.backend == "mysql" else ""
+            cursor.execute(f"SELECT last_date FROM {STATE_TABLE} WHERE id = 1{lock_clause}")
+            last_date = cursor.fetchone()[0]
+            cursor.execute(f"SELECT MAX(date) FROM {SOURCE_TABLE}")
+            max_date = cursor.fetchone()[0]
+
+            if last_date is not None:
+                last_date = str(last_date)
+            if max_date is not None:
+                max_date = str(max_date)
+
+            # 원본이 비었거나 과거로 되돌아갔으면 다시 적재된 것으로 보고 처음부터 집계
+            if rebuild or max_date is None or (last_date is not None and max_date < last_date):
+                cursor.execute(f"DELETE FROM {PROFILE_TABLE}")
+                last_date = None
+
+            if max_date is not None and (last_date is None or max_date > last_date):
+                cursor.execute(_UPSERT[pool.backend], (last_date or _MIN_DATE, max_date))
+                last_date = max_date
+
+            cursor.execute(f"UPDATE {STATE_TABLE} SET last_date = {ph} WHERE id = 1", (last_date,))
+            conn.commit()
+            return last_date
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def rebuild_profile(pool):
+    """집계 테이블을 비우고 원본 전체로 다시 집계합니다."""
+    return refresh_profile(pool, rebuild=True)
+
+
+def read_profile(pool):
+    """(charge_type, weekday, hour, kwh_sum, kwh_count) 집계 결과를 반환합니다.
+
+    집계 테이블을 갱신한 뒤 읽고, 갱신할 수 없으면 같은 집계를 DB에서 한 번 계산해 반환합니다.
+    """
+    try:
+        refresh_profile(pool)
+        query = f"SELECT charge_type, weekday, hour, kwh_sum, kwh_count FROM {PROFILE_TABLE}"
+    except Exception as e:
+        logger.warning("집계 테이블 갱신 실패, 일회성 집계로 대체합니다: %s", e)
+        query = _AGGREGATE[pool.backend]
+
+    df = read_sql(query, pool)
+    df["kwh_sum"] = pd.to_numeric(df["kwh_sum"])
+    df["kwh_count"] = pd.to_numeric(df["kwh_count"])
+    return df
+
+
+def read_weekly_profile(pool, weeks):
+    """최근 weeks주의 (charge_type, weekday, hour, age_weeks, kwh_sum, kwh_sq_sum, kwh_count) 집계를 반환합니다.
+
+    age_weeks는 마지막 날짜로부터 지난 주 수입니다. 충전방식 수 × 7 × 24 × weeks행 이하만 전송됩니다.
+    """
+    df = read_sql(_WEEKLY_AGGREGATE[pool.backend], pool, params=(weeks * 7,))
+    for column in ["age_weeks", "kwh_sum", "kwh_sq_sum", "kwh_count"]:
+        df[column] = pd.to_numeric(df[column])
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="충전 부하 집계 테이블을 만들고 원본 전체로 다시 집계합니다.")
+    parser.add_argument('--backend', default=None, help="DB 백엔드 (기본값: DB_BACKEND 환경변수)")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(backend=args.backend) if args.backend else ConnectionPool()
+    with pool.connection() as conn:
+        setup_profile(conn, pool.backend)
+    print(f"집계 완료 (마지막 반영 날짜: {rebuild_profile(pool)})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""공공데이터 CSV 파일을 청크 단위로 읽어 Parquet 캐시로 변환하는 모듈.
+
+충전소 CSV는 기관마다 인코딩(cp949/utf-8)이 다르고, 필드 수가 맞지 않는 행이 섞여 있습니다.
+처음 한 번은 CSV를 청크 단위로 읽으며 인코딩을 판별하고, 읽지 못한 행을 기록하고,
+필요한 열만 지정한 dtype으로 변환해 원본 파일 해시를 이름으로 하는 Parquet 파일에 저장합니다.
+이후에는 같은 파일이면 CSV를 다시 파싱하지 않고 Parquet 파일을 memory map으로 읽습니다.
+"""
+import codecs
+import hashlib
+import json
+import logging
+import os
+import re
+import warnings
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.db import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('CSV_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'csv'))
+
+# 인코딩 판별에 사용할 앞부분 크기
+SAMPLE_BYTES = 1024 * 1024
+CHUNK_ROWS = 50_000
+
+_BAD_LINE = re.compile(r'Skipping line (\d+): (.*)')
+
+
+def file_sha1(path, block_size=1024 * 1024):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def detect_encoding(path, sample_bytes=SAMPLE_BYTES):
+    """파일 앞부분이 utf-8로 읽히면 utf-8(-sig), 아니면 cp949로 판단합니다."""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    return sniff_encoding(sample)
+
+
+def sniff_encoding(sample):
+    """바이트 샘플(업로드 파일 등)의 인코딩을 detect_encoding과 같은 기준으로 판단합니다."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # 샘플 끝에서 잘린 멀티바이트 문자는 오류로 보지 않음
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp949'
+
+
+def _cache_path(digest, columns):
+    spec = hashlib.sha1(json.dumps(columns, ensure_ascii=False, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{digest}-{spec}.parquet")
+
+
+def parse_csv(path, columns, encoding=None, chunk_rows=CHUNK_ROWS):
+    """CSV를 청크 단위로 읽어 (DataFrame, 읽지 못한 행 목록)을 반환합니다.
+
+    columns는 {열 이름: dtype} 딕셔너리이며, 이 열만 지정한 순서/dtype으로 남깁니다.
+    읽지 못한 행 목록은 [(줄 번호, 사유), ...] 입니다.
+    """
+    encoding = encoding or detect_encoding(path)
+    chunks = []
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        # usecols를 지정하면 필드 수가 많은 행을 걸러내지 못하므로, 청크마다 열을 고름
+        reader = pd.read_csv(
+            path, encoding=encoding, dtype=str, chunksize=chunk_rows, on_bad_lines='warn',
+        )
+        for chunk in reader:
+            missing = [c for c in columns if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"{os.path.basename(path)}에 필요한 열이 없습니다: {missing}")
+            chunks.append(chunk[list(columns)])
+
+    rejected = []
+    for w in caught:
+        if issubclass(w.category, pd.errors.ParserWarning):
+            rejected += [(int(n), reason) for n, reason in _BAD_LINE.findall(str(w.message))]
+
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(columns))
+    for col, dtype in columns.items():
+        if dtype in ('float32', 'float64', 'Int32', 'Int64'):
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        elif dtype.startswith('datetime'):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        else:
+            df[col] = df[col].astype(dtype)
+    return df, rejected
+
+
+def read_csv_cached(path, columns, chunk_rows=CHUNK_ROWS):
+    """parse_csv와 같지만, 같은 파일(해시 기준)이면 Parquet 캐시를 memory map으로 읽습니다.
+
+    반환한 DataFrame의 attrs에 원본 인코딩('encoding')과 읽지 못한 행 목록('rejected_lines')이 들어 있습니다.
+    """
+    cache_path = _cache_path(file_sha1(path), columns)
+    if os.path.exists(cache_path):
+        try:
+            table = pq.read_table(cache_path, memory_map=True)
+            meta = table.schema.metadata or {}
+            df = table.to_pandas()
+            df.attrs['encoding'] = meta.get(b'encoding', b'').decode()
+            df.attrs['rejected_lines'] = [tuple(r) for r in json.loads(meta.get(b'rejected_lines', b'[]'))]
+            return df
+        except (OSError, pa.ArrowException, ValueError) as e:
+            logger.warning("CSV 캐시를 읽지 못해 다시 변환합니다 (%s): %s", cache_path, e)
+
+    encoding = detect_encoding(path)
+    df, rejected = parse_csv(path, columns, encoding, chunk_rows)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'source': os.path.basename(path).encode(),
+            b'encoding': encoding.encode(),
+            b'rejected_lines': json.dumps(rejected, ensure_ascii=False).encode(),
+        })
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException) as e:
+        logger.warning("CSV 캐시 저장 실패 (%s): %s", cache_path, e)
+
+    df.attrs['encoding'] = encoding
+    df.attrs['rejected_lines'] = rejected
+    return df
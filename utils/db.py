@@ -1,3 +1,10 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
 import pymysql
 import streamlit as st
 
@@ -6,12 +13,232 @@ pymysql.install_as_MySQLdb()
 import MySQLdb
 
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 사용할 DB 백엔드: 'mysql'(원격 team2 DB) 또는 'sqlite'(로컬 스냅샷 파일)
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql').lower()
+# sqlite 백엔드가 읽을 스냅샷 파일 (python -m utils.snapshot 으로 생성)
+SQLITE_PATH = os.environ.get('DB_SQLITE_PATH', os.path.join(PROJECT_ROOT, 'data', 'team2.sqlite'))
+
+# MySQL 접속 정보 (환경변수로 덮어쓸 수 있음)
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', '175.196.76.209'),
+    'user': os.environ.get('DB_USER', 'play'),
+    'passwd': os.environ.get('DB_PASSWORD', '123'),
+    'db': os.environ.get('DB_NAME', 'team2'),
+    'autocommit': True,
+}
+
+# 동시에 열어 둘 수 있는 최대 연결 수
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+# 연결이 모두 사용 중일 때 반납을 기다리는 최대 시간(초)
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+
+
+def connect_mysql():
+    return MySQLdb.connect(**DB_CONFIG)
+
+
+class SnapshotConnection(sqlite3.Connection):
+    """열 때의 스냅샷 파일 식별자(장치, inode)를 기억하는 sqlite 연결"""
+    path = None
+    file_id = None
+
+
+def _file_id(path):
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
+
+
+def connect_sqlite(path=None):
+    path = path or SQLITE_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"로컬 DB 파일이 없습니다: {path} (python -m utils.snapshot 으로 먼저 생성해주세요)"
+        )
+    # 열기 전에 식별자를 읽어, 그 사이 교체되더라도 다음 확인 때 다시 연결되게 함
+    file_id = _file_id(path)
+    # 풀의 연결은 여러 스레드를 옮겨 다니지만 한 번에 한 스레드만 사용함
+    conn = sqlite3.connect(path, check_same_thread=False, factory=SnapshotConnection)
+    conn.path, conn.file_id = path, file_id
+    return conn
+
+
+BACKENDS = {
+    'mysql': connect_mysql,
+    'sqlite': connect_sqlite,
+}
+
+
+class ConnectionPool:
+    """스레드 안전한 고정 크기 DB 연결 풀.
+
+    연결은 필요할 때 최대 size개까지 만들어지고, 사용이 끝나면 풀로 반납됩니다.
+    꺼낼 때마다 ping으로 상태를 확인하고, 끊어진 연결은 다시 연결합니다.
+    sqlite는 스냅샷 파일이 새 파일로 교체되었으면(utils.snapshot) 예전 파일 대신 새 파일로 다시 연결합니다.
+    """
+
+    def __init__(self, backend=DB_BACKEND, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        if backend not in BACKENDS:
+            raise ValueError(f"지원하지 않는 DB 백엔드입니다: {backend} (가능: {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        # 반납된 연결 (마지막에 반납된 것부터 꺼냄)
+        self._idle = []
+        # 연결 반납/폐기 시 기다리는 스레드를 깨우는 조건 변수 (_idle, _created 보호)
+        self._cond = threading.Condition()
+        self._created = 0
+
+    def _connect(self):
+        return BACKENDS[self.backend]()
+
+    def _is_alive(self, conn):
+        try:
+            if self.backend == 'mysql':
+                conn.ping(reconnect=True)
+            else:
+                conn.execute('SELECT 1')
+                # 교체 전 파일을 열어 둔 연결은 SELECT 1은 성공해도 예전 데이터를 읽음
+                if _file_id(conn.path) != conn.file_id:
+                    return False
+            return True
+        except Exception:
+            return False
+
+    def _free_slot(self):
+        """연결 하나가 차지하던 자리를 비우고, 자리를 기다리는 스레드를 깨웁니다."""
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def _new_connection(self):
+        """이미 확보한 자리(slot)에 새 연결을 만듭니다. 실패하면 자리를 돌려놓습니다."""
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._free_slot()
+
+    def acquire(self):
+        """풀에서 연결을 하나 꺼냅니다. 여유가 없으면 timeout까지 기다립니다."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{self.timeout}초 안에 사용 가능한 DB 연결이 없습니다.")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = None
+                self._created += 1
+
+        if conn is None:
+            return self._new_connection()
+        if self._is_alive(conn):
+            return conn
+
+        # 재연결에도 실패한 연결은 닫고 같은 자리에 새로 연결
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return self._new_connection()
+
+    def release(self, conn):
+        """사용이 끝난 연결을 풀에 반납합니다."""
+        with self._cond:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """with 블록 동안 연결을 빌려 쓰고, 블록이 끝나면 자동으로 반납합니다."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            # 오류가 난 연결은 상태를 알 수 없으므로 재사용하지 않음
+            self._discard(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
 @st.cache_resource
 def get_db():
-    return MySQLdb.connect(
-        host='175.196.76.209',
-        user='play',
-        passwd='123',
-        db='team2',
-        autocommit=True
-    )
+    """모든 세션이 공유하는 연결 풀을 반환합니다. (DB_BACKEND 설정을 따름)"""
+    return ConnectionPool()
+
+
+def read_sql(query, pool, params=None):
+    """풀에서 연결을 빌려 쿼리 결과를 DataFrame으로 반환합니다."""
+    with pool.connection() as conn:
+        return pd.read_sql(query, conn, params=params)
+
+
+# 데이터 버전 조회 결과를 재사용하는 시간(초)
+VERSION_TTL = int(os.environ.get('DB_VERSION_TTL', '60'))
+
+
+def query_table_version(pool, table):
+    """테이블 내용이 바뀌면 달라지는 버전 문자열을 DB에서 조회합니다.
+
+    MySQL은 테이블 전체를 읽는 CHECKSUM TABLE 대신 information_schema의 메타데이터
+    (마지막 수정 시각, 행 수, 데이터 크기)만 조회합니다.
+    sqlite는 스냅샷 도구가 기록한 원본 버전을, 기록이 없으면 행 수와 마지막 rowid로 대신합니다.
+    """
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if pool.backend == 'mysql':
+                try:
+                    # MySQL 8은 통계를 기본 하루 동안 캐싱하므로 이 세션에서는 바로 반영되게 함
+                    cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+                except Exception:
+                    pass  # 5.7/MariaDB에는 없는 변수
+                cursor.execute(
+                    "SELECT CREATE_TIME, UPDATE_TIME, TABLE_ROWS, DATA_LENGTH FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    (table,),
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise LookupError(f"테이블이 없습니다: {table}")
+                return "mysql:" + ":".join(str(v) for v in row)
+
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = '_snapshot_meta'")
+            if cursor.fetchone():
+                cursor.execute("SELECT checksum FROM _snapshot_meta WHERE table_name = ?", (table,))
+                row = cursor.fetchone()
+                if row:
+                    return row[0]
+            cursor.execute(f"SELECT COUNT(*), MAX(rowid) FROM {table}")
+            count, last_rowid = cursor.fetchone()
+            return f"sqlite:{count}:{last_rowid}"
+        finally:
+            cursor.close()
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def table_version(_pool, table):
+    """query_table_version 결과를 VERSION_TTL초 동안 캐싱합니다."""
+    return query_table_version(_pool, table)
@@ -0,0 +1,213 @@
+"""브랜드별 FAQ(kia/bmw/tesla/byd)와 보조금 FAQ(ev_faq)를 한 번에 검색하는 BM25 역색인.
+
+질문과 답변을 한글 글자 1-gram/2-gram과 영문/숫자 단어로 나눠 색인합니다. (띄어쓰기, 조사와 상관없이 검색)
+'충전'으로 검색하면 'charge' 등 같은 뜻의 단어도 함께 찾도록 동의어 묶음으로 검색어를 확장하고,
+BM25 점수가 높은 순으로 상위 k개를 반환합니다.
+
+문서별 BM25 가중치는 색인할 때 미리 계산해 두므로, 검색은 검색어 토큰의 게시 목록을 더하기만 합니다.
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.db import table_version
+from utils.parquet_cache import cached_read_sql
+
+# 검색 대상 (출처 이름 → (테이블, 분류 열)). 쿼리에 넣는 테이블/열 이름은 이 목록에 있는 것만 사용
+FAQ_SOURCES = {
+    'KIA': ('kia_faq', 'category'),
+    'BMW': ('bmw_faq', None),
+    'Tesla': ('tesla_faq', 'category'),
+    'BYD': ('byd_faq', None),
+    '보조금': ('ev_faq', 'tag'),
+}
+FAQ_TABLES = [table for table, _ in FAQ_SOURCES.values()]
+# 테이블 안에서 FAQ 순서를 정하는 열 (없는 테이블은 저장된 순서 그대로)
+FAQ_ORDER_COLUMNS = {'ev_faq': ('page', 'faq_order')}
+
+# 같은 뜻으로 검색할 단어 묶음 (한 단어가 검색어에 있으면 나머지도 함께 검색)
+SYNONYM_GROUPS = [
+    ('충전', 'charge', 'charging'),
+    ('배터리', 'battery', '밧데리'),
+    ('보증', 'warranty'),
+    ('타이어', 'tire', 'tyre'),
+    ('유지보수', 'maintenance', '정비', '점검'),
+    ('소프트웨어', 'software', 'ota'),
+    ('결제', 'payment'),
+    ('속도', 'speed'),
+    ('예약', 'reserve', 'reservation'),
+    ('성능', 'performance'),
+    ('안전', 'safety'),
+    ('서비스', 'service'),
+    ('보조금', '지원금', 'subsidy'),
+    ('주행거리', 'range'),
+]
+
+# BM25 파라미터
+K1 = 1.2
+B = 0.75
+# 질문에 나온 단어는 답변보다 이만큼 더 자주 나온 것으로 셈
+QUESTION_BOOST = 2
+# 동의어로 확장한 검색어 토큰의 가중치
+EXPANSION_WEIGHT = 0.7
+
+_WORD = re.compile(r'[가-힣]+|[a-z0-9]+')
+
+
+def _words(text):
+    return _WORD.findall(unicodedata.normalize('NFKC', str(text)).lower())
+
+
+def tokenize(text):
+    """색인용 토큰 목록. 한글 단어는 1-gram과 2-gram을 모두, 영문/숫자 단어는 단어 그대로 넣습니다."""
+    tokens = []
+    for word in _words(text):
+        if word[0] >= '가':
+            tokens += list(word)
+            tokens += [word[i:i + 2] for i in range(len(word) - 1)]
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def query_tokens(text):
+    """검색용 토큰 목록. 두 글자 이상 한글 단어는 2-gram만 사용합니다."""
+    tokens = []
+    for word in _words(text):
+        if word[0] >= '가' and len(word) > 1:
+            tokens += [word[i:i + 2] for i in range(len(word) - 1)]
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def expand_query(text):
+    """검색어에 든 단어의 동의어 목록 (검색어에 이미 있는 단어 제외)"""
+    words = set(_words(text))
+    joined = ' '.join(words)
+    expanded = []
+    for group in SYNONYM_GROUPS:
+        # 한글은 부분 일치('충전기' → '충전'), 영문은 단어 일치
+        if any((term in joined) if term[0] >= '가' else (term in words) for term in group):
+            expanded += [term for term in group if term not in joined]
+    return expanded
+
+
+def search_tokens(text):
+    """검색어의 (토큰, 가중치) 목록. 동의어로 확장한 토큰은 EXPANSION_WEIGHT를 곱합니다."""
+    weighted = [(t, 1.0) for t in query_tokens(text)]
+    weighted += [(t, EXPANSION_WEIGHT) for term in expand_query(text) for t in query_tokens(term)]
+    return weighted
+
+
+class FaqSearchIndex:
+    """FAQ 문서(source, category, question, answer)의 BM25 역색인.
+
+    게시 목록은 토큰별로 (문서 번호, BM25 가중치) 배열을 이어 붙인 CSR 형태로 저장합니다.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs.reset_index(drop=True)
+        n_docs = len(self.docs)
+
+        q_tokens = [tokenize(t) for t in self.docs['question']]
+        a_tokens = [tokenize(t) for t in self.docs['answer']]
+        doc_tokens = [q * QUESTION_BOOST + a for q, a in zip(q_tokens, a_tokens)]
+        lengths = np.array([len(t) for t in doc_tokens], dtype=np.float64)
+
+        doc_ids = np.repeat(np.arange(n_docs), lengths.astype(np.int64))
+        codes, vocab = pd.factorize(pd.Series([t for tokens in doc_tokens for t in tokens], dtype=object))
+        self.vocab = {token: i for i, token in enumerate(vocab)}
+
+        # (토큰, 문서)별 출현 횟수
+        pairs, tf = np.unique(codes.astype(np.int64) * max(n_docs, 1) + doc_ids, return_counts=True)
+        terms, docs_of = pairs // max(n_docs, 1), pairs % max(n_docs, 1)
+        df = np.bincount(terms, minlength=len(vocab))
+
+        avg_len = lengths.mean() if n_docs else 1.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        norm = K1 * (1 - B + B * lengths[docs_of] / max(avg_len, 1e-9))
+        self.weights = (idf[terms] * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+        self.postings = docs_of.astype(np.int32)
+        # np.unique 결과는 토큰 순으로 정렬되어 있으므로 토큰별 시작 위치만 기록
+        self.indptr = np.concatenate([[0], np.cumsum(df)])
+        self.sources = self.docs['source'].astype('category')
+        self._by_source = {
+            source: group for source, group in self.docs.groupby('source', observed=True, sort=False)
+        }
+
+    def __len__(self):
+        return len(self.docs)
+
+    def documents(self, source):
+        """출처 하나의 FAQ 전체 (FAQ 순서)"""
+        return self._by_source.get(source, self.docs.iloc[:0])
+
+    def _scores(self, query):
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for token, weight in search_tokens(query):
+            i = self.vocab.get(token)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            # 한 문서에는 토큰별로 게시 항목이 하나뿐이라 중복 인덱스 없이 더할 수 있음
+            scores[self.postings[start:end]] += weight * self.weights[start:end]
+        return scores
+
+    def search(self, query, k=30, sources=None):
+        """점수 순 상위 k개 FAQ (docs 열 + score). sources를 주면 해당 출처만 검색합니다."""
+        scores = self._scores(query)
+        if sources is not None:
+            scores[~self.sources.isin(sources).to_numpy()] = 0
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        # 점수가 같으면 원래 순서(출처별 FAQ 순서) 유지
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        result = self.docs.iloc[hits].copy()
+        result['score'] = scores[hits]
+        return result.reset_index(drop=True)
+
+
+def faq_documents_query():
+    """모든 FAQ 테이블에서 필요한 열만 읽는 UNION ALL 쿼리. 출처는 FAQ_SOURCES 순번으로 가져옵니다."""
+    parts = []
+    for code, (table, category) in enumerate(FAQ_SOURCES.values()):
+        order = FAQ_ORDER_COLUMNS.get(table, ('0', '0'))
+        category = category or "''"
+        parts.append(
+            f"SELECT {code} AS source, {category} AS category, question, answer, "
+            f"{order[0]} AS page, {order[1]} AS faq_order FROM {table}"
+        )
+    return "\nUNION ALL\n".join(parts)
+
+
+def load_faq_documents(conn):
+    """모든 FAQ 테이블을 한 번의 쿼리로 (source, category, question, answer) 한 표로 모읍니다.
+
+    source는 FAQ_SOURCES 순서의 category 열입니다.
+    """
+    df = cached_read_sql(faq_documents_query(), conn, FAQ_TABLES)
+    # 출처 순서, 출처 안에서는 FAQ 순서(없으면 저장된 순서)대로
+    df = df.sort_values(['source', 'page', 'faq_order'], kind='stable')
+    docs = pd.DataFrame({
+        'source': pd.Categorical.from_codes(df['source'].astype(int), categories=list(FAQ_SOURCES)),
+        'category': df['category'].fillna('').astype(str),
+        'question': df['question'].fillna('').astype(str),
+        'answer': df['answer'].fillna('').astype(str),
+    })
+    return docs.reset_index(drop=True)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _build_faq_index(versions, _conn):
+    return FaqSearchIndex(load_faq_documents(_conn))
+
+
+def get_faq_index(conn):
+    """FAQ 검색 인덱스(전체 FAQ 포함). FAQ 테이블 중 하나라도 데이터 버전이 바뀌면 다시 만듭니다."""
+    versions = tuple(table_version(conn, table) for table in FAQ_TABLES)
+    return _build_faq_index(versions, conn)
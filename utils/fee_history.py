@@ -0,0 +1,156 @@
+"""충전 요금(charge_fee) 스냅샷을 날짜별로 쌓아 두는 요금 이력 저장소.
+
+charge_fee 테이블은 항상 최신 요금 하나만 담고 있어, 새로 적재하면 이전 요금이 사라집니다.
+데이터 버전이 바뀔 때마다 (업체, 회원 구분)별 요금을 기록하되, 직전 시점과 요금이 같은 행은 저장하지 않고
+바뀐 행(신규/변경, 사라진 업체는 요금 NaN)만 저장합니다. 업체명은 category(사전 인코딩)로 저장합니다.
+
+어떤 날짜의 전체 요금표는 그 날짜까지의 변경 행 중 (업체, 구분)별 마지막 행으로 복원합니다.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.db import PROJECT_ROOT
+
+HISTORY_PATH = os.environ.get(
+    'FEE_HISTORY_PATH', os.path.join(PROJECT_ROOT, 'data', 'fee_history', 'charge_fee_history.parquet')
+)
+
+CUSTOMER_TYPES = ['회원가', '비회원가']
+KEY = ['company', 'customer_type']
+
+# 같은 요금으로 볼 오차 (원 / kWh)
+FEE_TOLERANCE = 1e-6
+
+
+def _empty_deltas():
+    return pd.DataFrame({
+        'date': pd.Series(dtype='datetime64[ns]'),
+        'company': pd.Categorical([]),
+        'customer_type': pd.Categorical([], categories=CUSTOMER_TYPES),
+        'fee': pd.Series(dtype='float32'),
+    })
+
+
+class FeeHistory:
+    """날짜별 요금 변경 행(deltas)과 기록한 날짜 목록(dates)을 관리합니다."""
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # 마지막으로 기록한 원본 데이터 버전 (같은 버전은 다시 기록하지 않음)
+        self.version = None
+        self.deltas, self.dates = _empty_deltas(), []
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        table = pq.read_table(self.path, memory_map=True)
+        meta = table.schema.metadata or {}
+        self.deltas = table.to_pandas()
+        self.dates = [pd.Timestamp(d) for d in json.loads(meta.get(b'dates', b'[]'))]
+        self.version = meta.get(b'version', b'').decode() or None
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        table = pa.Table.from_pandas(self.deltas, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'dates': json.dumps([d.strftime('%Y-%m-%d') for d in self.dates]).encode(),
+            b'version': (self.version or '').encode(),
+        })
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _normalize(fees):
+        """(company, customer_type, fee) 표를 키마다 한 행으로 정리합니다."""
+        fees = fees.dropna(subset=KEY)
+        fees = fees.groupby(KEY, observed=True, as_index=False)['fee'].mean()
+        fees['fee'] = fees['fee'].astype('float32')
+        return fees
+
+    def state_at(self, date=None):
+        """date 시점(없으면 최신)의 (company, customer_type, fee) 요금표"""
+        deltas = self.deltas
+        if date is not None:
+            deltas = deltas[deltas['date'] <= pd.Timestamp(date)]
+        # 변경 행은 날짜순으로 쌓이므로 키별 마지막 행이 그 시점의 요금
+        state = deltas.drop_duplicates(subset=KEY, keep='last')
+        state = state[state['fee'].notna()]
+        return state[KEY + ['fee']].astype({'company': str, 'customer_type': str}).reset_index(drop=True)
+
+    def record(self, fees, date, version=None):
+        """date 시점의 요금표를 기록합니다. 같은 날짜를 다시 기록하면 그 날짜의 기록을 교체합니다.
+
+        fees는 company, customer_type, fee 열을 가진 DataFrame입니다. 새로 저장한 변경 행 수를 반환합니다.
+        version(원본 데이터 버전)이 마지막 기록과 같으면 아무것도 하지 않습니다.
+        """
+        date = pd.Timestamp(date).normalize()
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            if self.dates and date < self.dates[-1]:
+                raise ValueError(f"마지막 기록({self.dates[-1]:%Y-%m-%d})보다 이전 날짜는 기록할 수 없습니다: {date:%Y-%m-%d}")
+            self.deltas = self.deltas[self.deltas['date'] < date]
+            self.dates = [d for d in self.dates if d < date]
+
+            new = self._normalize(fees)
+            old = self.state_at()
+            merged = new.merge(old, on=KEY, how='outer', suffixes=('', '_old'), indicator=True)
+            removed = merged['_merge'] == 'right_only'
+            changed = (merged['_merge'] == 'left_only') | (
+                (merged['_merge'] == 'both')
+                & ~np.isclose(merged['fee'], merged['fee_old'], atol=FEE_TOLERANCE, equal_nan=True)
+            )
+            delta = merged.loc[changed | removed, KEY + ['fee']].copy()
+            delta.loc[removed[changed | removed].to_numpy(), 'fee'] = np.nan
+            delta.insert(0, 'date', date)
+
+            previous = self.deltas.astype({'company': str, 'customer_type': str})
+            companies = pd.Index(previous['company'].unique()).union(pd.Index(delta['company'].unique()))
+            self.deltas = pd.concat([previous, delta], ignore_index=True) if len(previous) else delta
+            self.deltas = self.deltas.astype({
+                'company': pd.CategoricalDtype(companies),
+                'customer_type': pd.CategoricalDtype(CUSTOMER_TYPES),
+                'fee': 'float32',
+            })
+            self.dates.append(date)
+            self.version = version
+            self._save()
+            return len(delta)
+
+    @property
+    def companies(self):
+        """기록된 적이 있는 모든 업체 (지금은 사라진 업체 포함)"""
+        return sorted(self.deltas['company'].astype(str).unique())
+
+    def series(self, company):
+        """업체의 기록 날짜별 요금 (index: date, columns: 회원가/비회원가)"""
+        rows = self.deltas[self.deltas['company'] == company]
+        # 사라진 업체(NaN)는 ffill로 채워지지 않도록 잠시 inf로 표시
+        wide = rows.assign(fee=rows['fee'].fillna(np.inf)).pivot_table(
+            index='date', columns='customer_type', values='fee', aggfunc='last', observed=False
+        )
+        wide = wide.reindex(index=pd.DatetimeIndex(self.dates, name='date'), columns=CUSTOMER_TYPES)
+        # 변경이 없던 날짜는 직전 요금 그대로
+        return wide.ffill().replace(np.inf, np.nan)
+
+    def movers(self, start, end, customer_type='비회원가', n=10):
+        """start → end 사이 요금이 가장 많이 바뀐 업체 n곳 (변동 폭 절댓값 기준)"""
+        a = self.state_at(start)
+        b = self.state_at(end)
+        a = a[a['customer_type'] == customer_type]
+        b = b[b['customer_type'] == customer_type]
+        both = a.merge(b, on=KEY, suffixes=('_start', '_end'))
+        both['change'] = both['fee_end'] - both['fee_start']
+        both['change_pct'] = both['change'] / both['fee_start'] * 100
+        both = both[both['change'].abs() > FEE_TOLERANCE]
+        order = np.argsort(-both['change'].abs().to_numpy(), kind='stable')[:n]
+        return both.iloc[order][['company', 'fee_start', 'fee_end', 'change', 'change_pct']].reset_index(drop=True)
@@ -0,0 +1,48 @@
+"""긴 목록을 페이지 단위로 나눠 보여주는 위젯.
+
+expander를 행마다 하나씩 만들면 결과 전체가 매 rerun마다 브라우저로 전송됩니다.
+페이지 크기/번호 위젯으로 보이는 범위만 고르고, 그 범위의 행만 그리도록 합니다.
+"""
+import math
+
+import streamlit as st
+
+PAGE_SIZES = [10, 20, 50]
+
+
+def _keep_page_size(size_key, widget_key):
+    # 위젯을 그리지 않는 rerun에는 위젯 상태가 지워지므로 고른 값을 일반 키에 따로 보관
+    st.session_state[size_key] = st.session_state[widget_key]
+
+
+def paginate(n_rows, key, reset_on=None):
+    """페이지 크기/번호 위젯을 그리고 현재 페이지의 행 범위 (start, end)를 반환합니다.
+
+    reset_on(검색어, 필터 등)이 지난 rerun과 다르면 첫 페이지로 돌아갑니다.
+    """
+    size_key, page_key, reset_key = f"{key}_page_size", f"{key}_page", f"{key}_page_reset"
+    widget_key = f"{size_key}_select"
+    page_size = st.session_state.get(size_key, PAGE_SIZES[0])
+    n_pages = max(1, math.ceil(n_rows / page_size))
+
+    # 위젯을 만들기 전에 페이지 번호를 범위 안으로 맞춤
+    if st.session_state.get(reset_key) != reset_on:
+        st.session_state[reset_key] = reset_on
+        st.session_state[page_key] = 1
+    elif st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+
+    if n_rows <= PAGE_SIZES[0]:
+        return 0, n_rows
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.selectbox("페이지당 항목 수", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=widget_key,
+                     on_change=_keep_page_size, args=(size_key, widget_key))
+    with col2:
+        page = st.number_input(f"페이지 (전체 {n_pages})", min_value=1, max_value=n_pages, step=1, key=page_key)
+    start = (int(page) - 1) * page_size
+    end = min(start + page_size, n_rows)
+    with col3:
+        st.caption(f"전체 {n_rows}건 중 {start + 1}–{end}번째")
+    return start, end
@@ -0,0 +1,98 @@
+"""DB 조회 결과를 디스크에 Parquet 스냅샷으로 저장하는 캐시.
+
+st.cache_data는 프로세스 메모리에만 남기 때문에 재시작하면 모든 테이블을 다시 받아와야 합니다.
+이 모듈은 (테이블, 쿼리)마다 Parquet 파일을 하나씩 만들고, 파일에 데이터 버전과 체크섬을 함께 기록합니다.
+재시작 후에는 버전만 DB에 확인하고, 바뀌지 않았으면 파일을 memory map으로 바로 읽습니다.
+"""
+import hashlib
+import logging
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.db import PROJECT_ROOT, read_sql, table_version
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('PARQUET_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'parquet'))
+
+
+def frame_checksum(df):
+    """DataFrame 내용(인덱스 제외)의 체크섬을 계산합니다."""
+    hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+
+def snapshot_path(table, query):
+    key = hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]
+    if not isinstance(table, str):
+        table = '+'.join(table)
+    return os.path.join(CACHE_DIR, f"{table}-{key}.parquet")
+
+
+def read_snapshot(path, version=None):
+    """스냅샷 파일을 읽습니다. version이 다르거나 파일이 손상됐으면 None을 반환합니다.
+
+    체크섬은 쓸 때 검증하므로, 읽을 때는 버전만 확인합니다. (손상된 파일은 Parquet 읽기 오류로 걸러짐)
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        # 스키마(파일 끝 메타데이터)만 먼저 읽어 버전을 확인
+        meta = pq.read_schema(path).metadata or {}
+        if version is not None and meta.get(b'version', b'').decode() != version:
+            return None
+        return pq.read_table(path, memory_map=True).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def write_snapshot(path, df, version):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Decimal 등은 Parquet을 거치며 표현이 바뀔 수 있으므로, 다시 읽었을 때의 값으로 체크섬을 계산
+    checksum = frame_checksum(table.to_pandas())
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'version': version.encode(),
+        b'checksum': checksum.encode(),
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    # 쓴 파일을 한 번 다시 읽어 검증한 뒤에만 교체
+    if frame_checksum(pq.read_table(tmp_path).to_pandas()) != checksum:
+        os.remove(tmp_path)
+        raise OSError(f"스냅샷 검증 실패: {path}")
+    os.replace(tmp_path, path)
+
+
+def cached_read_sql(query, pool, table):
+    """read_sql과 같지만, table의 데이터 버전이 그대로면 디스크 스냅샷을 반환합니다.
+
+    query가 읽는 테이블 이름을 table로 넘겨야 버전 확인이 올바르게 동작합니다.
+    여러 테이블을 읽는 쿼리(UNION 등)는 테이블 이름 목록을 넘기며, 그중 하나라도 바뀌면 다시 조회합니다.
+    DB에 연결할 수 없을 때는 버전과 상관없이 마지막 스냅샷을 사용합니다.
+    """
+    path = snapshot_path(table, query)
+    tables = [table] if isinstance(table, str) else list(table)
+    try:
+        version = '|'.join(table_version(pool, t) for t in tables)
+    except Exception:
+        df = read_snapshot(path)
+        if df is None:
+            raise
+        logger.warning("DB 버전 확인 실패, 마지막 스냅샷 사용: %s", path)
+        return df
+
+    df = read_snapshot(path, version)
+    if df is not None:
+        return df
+
+    df = read_sql(query, pool)
+    try:
+        write_snapshot(path, df, version)
+    except (OSError, pa.ArrowException) as e:
+        logger.warning("스냅샷 저장 실패 (%s): %s", path, e)
+    return df
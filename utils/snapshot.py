@@ -0,0 +1,107 @@
+"""원격 team2 MySQL DB의 테이블을 로컬 sqlite 파일로 복사하는 스냅샷 도구.
+
+사용법:
+    python -m utils.snapshot                      # 모든 테이블을 data/team2.sqlite 로 복사
+    python -m utils.snapshot -o /tmp/team2.sqlite # 출력 파일 지정
+    python -m utils.snapshot -t charge_fee ev_faq # 일부 테이블만 복사
+
+생성된 파일은 DB_BACKEND=sqlite 로 앱을 실행하면 그대로 사용됩니다.
+"""
+import argparse
+import decimal
+import os
+import shutil
+import sqlite3
+import time
+
+import pandas as pd
+
+from utils.congestion_profile import SOURCE_TABLE as LOAD_TABLE, setup_profile
+from utils.db import SQLITE_PATH, ConnectionPool, query_table_version, read_sql
+
+# 앱이 읽는 테이블 목록
+SNAPSHOT_TABLES = [
+    'ev_registration',
+    'charge_fee',
+    'ev_charge_load',
+    'ev_local_car_subsidy',
+    'ev_model_local_subsidy',
+    'ev_local_contact',
+    'ev_faq',
+    'kia_faq',
+    'bmw_faq',
+    'tesla_faq',
+    'byd_faq',
+]
+
+CHUNK_SIZE = 5000
+
+
+def _to_sqlite_types(df):
+    """sqlite가 저장할 수 없는 Decimal 값을 float으로 변환합니다."""
+    for col in df.columns[df.dtypes == object]:
+        sample = df[col].dropna()
+        if not sample.empty and isinstance(sample.iloc[0], decimal.Decimal):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def copy_table(pool, table, dest):
+    # 복사 전에 원본 버전을 읽어 두어야 복사 도중 바뀐 데이터를 다음 스냅샷에서 놓치지 않음
+    version = query_table_version(pool, table)
+    df = _to_sqlite_types(read_sql(f"SELECT * FROM {table}", pool))
+    df.to_sql(table, dest, if_exists='replace', index=False, chunksize=CHUNK_SIZE)
+
+    # 원본 버전을 함께 기록하면 sqlite 백엔드에서도 같은 데이터 버전을 사용할 수 있음
+    dest.execute(
+        "CREATE TABLE IF NOT EXISTS _snapshot_meta ("
+        "table_name TEXT PRIMARY KEY, checksum TEXT, row_count INTEGER, copied_at TEXT)"
+    )
+    dest.execute(
+        "INSERT OR REPLACE INTO _snapshot_meta VALUES (?, ?, ?, ?)",
+        (table, version, len(df), time.strftime('%Y-%m-%d %H:%M:%S')),
+    )
+    return len(df)
+
+
+def create_snapshot(output=SQLITE_PATH, tables=SNAPSHOT_TABLES, pool=None):
+    """tables를 MySQL에서 읽어 output 파일에 씁니다.
+
+    임시 파일에 먼저 쓴 뒤 교체하므로, 복사 도중에도 앱은 이전 스냅샷을 계속 읽을 수 있습니다.
+    """
+    pool = pool or ConnectionPool(backend='mysql')
+    tmp_path = output + '.tmp'
+    if os.path.exists(output):
+        # 일부 테이블만 갱신할 때 나머지 테이블은 기존 스냅샷 것을 유지
+        shutil.copyfile(output, tmp_path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    dest = sqlite3.connect(tmp_path)
+    try:
+        for table in tables:
+            started = time.perf_counter()
+            rows = copy_table(pool, table, dest)
+            print(f"{table}: {rows:,} rows ({time.perf_counter() - started:.1f}s)")
+        dest.commit()
+        # 혼잡도 집계 테이블도 미리 만듦 (원본을 새로 복사했으면 처음부터 다시 집계)
+        setup_profile(dest, 'sqlite', reset=LOAD_TABLE in tables)
+    finally:
+        dest.close()
+
+    os.replace(tmp_path, output)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="team2 MySQL 테이블을 로컬 sqlite 파일로 복사합니다.")
+    parser.add_argument('-o', '--output', default=SQLITE_PATH, help="출력 sqlite 파일 경로")
+    parser.add_argument('-t', '--tables', nargs='+', default=SNAPSHOT_TABLES, help="복사할 테이블 목록")
+    args = parser.parse_args()
+
+    path = create_snapshot(args.output, args.tables)
+    print(f"스냅샷 저장 완료: {path}")
+
+
+if __name__ == '__main__':
+    main()
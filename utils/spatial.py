@@ -0,0 +1,181 @@
+"""충전소 좌표(위도/경도)용 공간 인덱스."""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """두 좌표(배열 가능) 사이의 대원 거리(km)"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GridIndex:
+    """위도/경도를 cell_deg 크기의 격자로 나눈 인덱스.
+
+    점들을 (격자 행, 열) 키 순서로 정렬해 두고, 영역 조회 시 영역에 걸친 격자 행마다
+    이진 탐색으로 연속 구간을 잘라냅니다. 조회 비용은 전체 점 수가 아니라 영역 안의 점 수에 비례합니다.
+    """
+
+    def __init__(self, lat, lon, cell_deg=0.05):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self._aggregates = {}
+
+        if len(self.lat) == 0:
+            self.max_abs_lat = 0.0
+            self.lat0 = self.lon0 = 0.0
+            self.n_rows = self.n_cols = 0
+            self.order = np.empty(0, dtype=np.intp)
+            self.sorted_keys = np.empty(0, dtype=np.int64)
+            return
+
+        self.max_abs_lat = float(np.abs(self.lat).max())
+        self.lat0 = np.floor(self.lat.min())
+        self.lon0 = np.floor(self.lon.min())
+        rows = ((self.lat - self.lat0) // cell_deg).astype(np.int64)
+        cols = ((self.lon - self.lon0) // cell_deg).astype(np.int64)
+        self.n_rows = int(rows.max()) + 1
+        self.n_cols = int(cols.max()) + 1
+
+        keys = rows * self.n_cols + cols
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row_col(self, lat, lon):
+        row = int(np.floor((lat - self.lat0) / self.cell_deg))
+        col = int(np.floor((lon - self.lon0) / self.cell_deg))
+        return row, col
+
+    def query_bbox(self, south, west, north, east):
+        """영역 안에 있는 점의 위치(원본 순서 기준 인덱스) 배열을 반환합니다."""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        r0, c0 = self._row_col(south, west)
+        r1, c1 = self._row_col(north, east)
+        r0, r1 = max(r0, 0), min(r1, self.n_rows - 1)
+        c0, c1 = max(c0, 0), min(c1, self.n_cols - 1)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.intp)
+
+        rows = np.arange(r0, r1 + 1, dtype=np.int64)
+        starts = np.searchsorted(self.sorted_keys, rows * self.n_cols + c0, side='left')
+        ends = np.searchsorted(self.sorted_keys, rows * self.n_cols + c1, side='right')
+        parts = [self.order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+
+        idx = np.concatenate(parts)
+        # 경계 격자에 걸친 점은 실제 좌표로 한 번 더 거름
+        inside = (
+            (self.lat[idx] >= south) & (self.lat[idx] <= north)
+            & (self.lon[idx] >= west) & (self.lon[idx] <= east)
+        )
+        return np.sort(idx[inside])
+
+    def aggregate(self, cell_deg):
+        """cell_deg 크기 격자별 점 개수와 무게중심 (lat, lon, count) 배열. 크기별로 한 번만 계산합니다."""
+        cached = self._aggregates.get(cell_deg)
+        if cached is not None:
+            return cached
+
+        if len(self) == 0:
+            empty = np.empty(0)
+            result = (empty, empty, np.empty(0, dtype=np.int64))
+        else:
+            rows = ((self.lat - self.lat0) // cell_deg).astype(np.int64)
+            cols = ((self.lon - self.lon0) // cell_deg).astype(np.int64)
+            keys = rows * (int(cols.max()) + 1) + cols
+            _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            lat = np.bincount(inverse, weights=self.lat) / counts
+            lon = np.bincount(inverse, weights=self.lon) / counts
+            result = (lat, lon, counts)
+
+        self._aggregates[cell_deg] = result
+        return result
+
+    def _ring_candidates(self, row, col, radius):
+        """(row, col) 격자에서 체비셰프 거리가 정확히 radius인 격자들에 속한 점 인덱스"""
+        rows = np.arange(max(row - radius, 0), min(row + radius, self.n_rows - 1) + 1, dtype=np.int64)
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        # 고리의 위/아래 변은 열 구간 전체, 좌/우 변은 양 끝 열 하나씩
+        edge = np.abs(rows - row) == radius
+        c0, c1 = max(col - radius, 0), min(col + radius, self.n_cols - 1)
+        lo = [rows[edge] * self.n_cols + c0] if c0 <= c1 else []
+        hi = [rows[edge] * self.n_cols + c1] if c0 <= c1 else []
+        side_rows = rows[~edge]
+        for side_col in {col - radius, col + radius}:
+            if 0 <= side_col < self.n_cols:
+                lo.append(side_rows * self.n_cols + side_col)
+                hi.append(side_rows * self.n_cols + side_col)
+        if not lo:
+            return np.empty(0, dtype=np.intp)
+
+        starts = np.searchsorted(self.sorted_keys, np.concatenate(lo), side='left')
+        ends = np.searchsorted(self.sorted_keys, np.concatenate(hi), side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.intp)
+
+        # 여러 [start, end) 구간을 한 번에 이어 붙임
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.order[offsets + np.arange(total)]
+
+    def _ring_lower_bound_km(self, radius, lat):
+        """radius 고리 밖의 점까지 거리의 하한(km)
+
+        고리 밖의 점은 위도 또는 경도 차이가 radius * cell_deg보다 큽니다.
+        위도 차이 d는 거리 R*d 이상, 경도 차이 d는 두 점의 위도가 |φ| <= φmax일 때
+        2R*asin(cos(φmax) * sin(d/2)) 이상입니다.
+        """
+        d = np.radians(radius * self.cell_deg)
+        phi_max = np.radians(max(self.max_abs_lat, abs(lat)))
+        lat_bound = EARTH_RADIUS_KM * d
+        lon_bound = 2 * EARTH_RADIUS_KM * np.arcsin(min(np.cos(phi_max) * np.sin(min(d, np.pi) / 2), 1.0))
+        return min(lat_bound, lon_bound)
+
+    def nearest(self, lat, lon, k=5):
+        """(lat, lon)에서 가까운 k개 점의 (인덱스 배열, 거리 km 배열)을 가까운 순서로 반환합니다.
+
+        질의 격자에서 시작해 한 고리씩 넓혀 가며, k번째 거리가 아직 보지 않은 고리의
+        거리 하한보다 작아지면 멈춥니다. 하한이 정확하므로 결과는 전수 비교와 같습니다.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        row = int(np.floor((lat - self.lat0) / self.cell_deg))
+        col = int(np.floor((lon - self.lon0) / self.cell_deg))
+        # 격자 밖의 질의는 격자에 닿는 고리부터 시작
+        radius = max(0, -row, row - (self.n_rows - 1), -col, col - (self.n_cols - 1))
+        max_radius = max(row, self.n_rows - 1 - row, col, self.n_cols - 1 - col, radius)
+
+        best_idx = np.empty(0, dtype=np.intp)
+        best_dist = np.empty(0)
+        while radius <= max_radius:
+            idx = self._ring_candidates(row, col, radius)
+            if len(idx):
+                # 지금까지의 상위 k개와 새 고리의 점만 비교
+                best_idx = np.concatenate([best_idx, idx])
+                best_dist = np.concatenate([best_dist, haversine_km(lat, lon, self.lat[idx], self.lon[idx])])
+                if len(best_idx) > k:
+                    keep = np.argpartition(best_dist, k - 1)[:k]
+                    best_idx, best_dist = best_idx[keep], best_dist[keep]
+            if len(best_idx) == k and best_dist.max() <= self._ring_lower_bound_km(radius, lat):
+                break
+            radius += 1
+
+        order = np.argsort(best_dist, kind='stable')
+        return best_idx[order], best_dist[order]
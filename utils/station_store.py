@@ -0,0 +1,193 @@
+"""날짜별 충전소 CSV 스냅샷을 충전소 ID 기준으로 증분 병합하는 저장소.
+
+data 폴더에 '..._YYYYMMDD.csv' 형식으로 월별 파일이 쌓이면, 이미 반영한 파일은 다시 읽지 않고
+새 파일만 현재 충전소 표와 비교해 추가/삭제/변경된 충전소를 기록합니다.
+행마다 값 열의 해시를 함께 저장해 두므로, 변경 여부는 해시 비교만으로 판단합니다.
+
+저장 위치 (STATION_STORE_DIR/<이름>/):
+    stations.parquet   가장 최근 파일 기준의 현재 충전소 표 (+ row_hash)
+    changes.parquet    파일별 추가/삭제/변경 이력 (ID, 날짜, 구분)
+    manifest.json      반영한 파일 목록과 파일별 변경 건수
+"""
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.csv_cache import file_sha1, read_csv_cached
+from utils.db import PROJECT_ROOT
+
+STORE_DIR = os.environ.get('STATION_STORE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'stations'))
+
+_DATED_FILE = re.compile(r'_(\d{8})\.csv$')
+# 날짜가 없는 파일은 가장 오래된 것으로 취급
+_NO_DATE = '00000000'
+
+CHANGE_TYPES = ['added', 'removed', 'changed']
+
+_update_lock = threading.Lock()
+
+
+def list_dated_files(directory, keyword):
+    """파일 이름에 keyword가 들어간 CSV들을 (날짜, 경로) 목록으로 날짜순 반환합니다."""
+    keyword = unicodedata.normalize('NFC', keyword)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    files = []
+    for filename in names:
+        name = unicodedata.normalize('NFC', filename)
+        if keyword in name and name.endswith('.csv'):
+            m = _DATED_FILE.search(name)
+            files.append((m.group(1) if m else _NO_DATE, os.path.join(directory, filename)))
+    return sorted(files)
+
+
+def _file_stat(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _write_parquet(df, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+
+
+class StationStore:
+    """key 열(충전소 ID) 기준으로 날짜별 스냅샷을 병합한 충전소 표.
+
+    columns는 {열 이름: dtype}이며 key 열을 포함해야 합니다.
+    """
+
+    def __init__(self, name, key, columns, store_dir=STORE_DIR):
+        self.key = key
+        self.columns = columns
+        self.value_columns = [c for c in columns if c != key]
+        self.dir = os.path.join(store_dir, name)
+        self.manifest_path = os.path.join(self.dir, 'manifest.json')
+        self.stations_path = os.path.join(self.dir, 'stations.parquet')
+        self.changes_path = os.path.join(self.dir, 'changes.parquet')
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {'columns': None, 'files': []}
+        return manifest
+
+    def stations(self):
+        """현재 충전소 표 (row_hash 열 제외)"""
+        if not os.path.exists(self.stations_path):
+            return pd.DataFrame({c: pd.Series(dtype=t) for c, t in self.columns.items()})
+        df = pq.read_table(self.stations_path, memory_map=True).to_pandas()
+        return df.drop(columns='row_hash')
+
+    def changes(self):
+        """파일별 추가/삭제/변경 이력 (key, date, change)"""
+        if not os.path.exists(self.changes_path):
+            return pd.DataFrame({self.key: pd.Series(dtype=object), 'date': pd.Series(dtype=object),
+                                 'change': pd.Categorical([], categories=CHANGE_TYPES)})
+        return pq.read_table(self.changes_path, memory_map=True).to_pandas()
+
+    def _is_applied(self, entry, date, path):
+        """manifest의 항목이 지금 파일과 같은지 (크기/수정 시각이 다를 때만 해시 비교)"""
+        if entry['name'] != os.path.basename(path) or entry['date'] != date:
+            return False
+        stat = _file_stat(path)
+        if stat['size'] == entry['size'] and stat['mtime_ns'] == entry['mtime_ns']:
+            return True
+        return file_sha1(path) == entry['sha1']
+
+    def _row_hashes(self, df):
+        return pd.util.hash_pandas_object(df[self.value_columns], index=False).to_numpy()
+
+    def _diff(self, current, new):
+        """현재 표와 새 스냅샷을 비교해 (추가, 삭제, 변경) ID 배열을 반환합니다."""
+        old_pos = pd.Index(current[self.key]).get_indexer(new[self.key])
+        added = new[self.key].to_numpy()[old_pos < 0]
+        both = old_pos >= 0
+        changed_mask = current['row_hash'].to_numpy()[old_pos[both]] != new['row_hash'].to_numpy()[both]
+        changed = new[self.key].to_numpy()[both][changed_mask]
+        removed = current[self.key].to_numpy()[~pd.Index(current[self.key]).isin(new[self.key])]
+        return added, removed, changed
+
+    def update(self, files):
+        """(날짜, 경로) 목록 중 아직 반영하지 않은 파일만 병합합니다. 새로 반영한 파일 수를 반환합니다.
+
+        이미 반영한 파일이 바뀌었거나 중간 날짜 파일이 새로 생기면 처음부터 다시 병합합니다.
+        """
+        with _update_lock:
+            manifest = self.manifest()
+            applied = manifest['files']
+            reusable = (
+                manifest.get('columns') == self.columns
+                and len(applied) <= len(files)
+                and all(self._is_applied(e, d, p) for e, (d, p) in zip(applied, files))
+            )
+            if not reusable:
+                applied = []
+            pending = files[len(applied):]
+            if not pending:
+                return 0
+
+            if applied:
+                current = pq.read_table(self.stations_path).to_pandas()
+                changes = [self.changes()]
+            else:
+                current, changes = None, []
+
+            for date, path in pending:
+                new = read_csv_cached(path, self.columns)
+                new = new.dropna(subset=[self.key]).drop_duplicates(subset=[self.key], keep='last')
+                new = new.reset_index(drop=True)
+                new['row_hash'] = self._row_hashes(new)
+
+                if current is None:
+                    # 첫 파일은 기준 데이터라 이력에 남기지 않음
+                    added, removed, changed = new[self.key].to_numpy(), np.empty(0), np.empty(0)
+                else:
+                    added, removed, changed = self._diff(current, new)
+                    ids = np.concatenate([added, removed, changed])
+                    kinds = np.repeat(CHANGE_TYPES, [len(added), len(removed), len(changed)])
+                    changes.append(pd.DataFrame({
+                        self.key: ids,
+                        'date': date,
+                        'change': pd.Categorical(kinds, categories=CHANGE_TYPES),
+                    }))
+
+                current = new
+                applied.append({
+                    'name': os.path.basename(path),
+                    'date': date,
+                    'sha1': file_sha1(path),
+                    **_file_stat(path),
+                    'total': len(new),
+                    'added': len(added),
+                    'removed': len(removed),
+                    'changed': len(changed),
+                    'rejected': len(new.attrs.get('rejected_lines', [])),
+                })
+
+            os.makedirs(self.dir, exist_ok=True)
+            _write_parquet(current, self.stations_path)
+            if changes:
+                _write_parquet(pd.concat(changes, ignore_index=True), self.changes_path)
+            elif os.path.exists(self.changes_path):
+                os.remove(self.changes_path)
+
+            # manifest를 마지막에 써야 중간에 실패해도 다음 실행에서 다시 병합함
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'columns': self.columns, 'files': applied}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+            return len(pending)